@@ -0,0 +1,79 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment as scipy_assignment
+except ImportError:  # scipy is optional; fall back to the NumPy solver below
+    scipy_assignment = None
+
+def hungarian(cost):
+    """Minimum-cost assignment of every row of an (n, m) matrix, n <= m.
+
+    Shortest augmenting path form of the Hungarian algorithm with row and
+    column potentials, O(n^2 m), the inner scan over columns vectorized.
+    Returns the column assigned to each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=int)  # 1-based row holding each column, 0 if free
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while owner[j0] != 0:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            tree = np.flatnonzero(used)
+            u[owner[tree]] += delta
+            v[tree] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+        # Flip the augmenting path back to the root
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    cols = np.empty(n, dtype=int)
+    assigned = np.flatnonzero(owner[1:]) + 1
+    cols[owner[assigned] - 1] = assigned - 1
+    return cols
+
+def min_cost_assignment(cost):
+    """Row/column pairs of a minimum-cost one-to-one assignment.
+
+    `cost` may be rectangular and may hold inf for forbidden pairs; as
+    many pairs as possible are made and none of them is forbidden. Uses
+    scipy's solver when scipy is installed. Returns (rows, cols) arrays.
+    """
+    cost = np.asarray(cost, dtype=float)
+    if not cost.size:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    finite = np.isfinite(cost)
+    if not finite.any():
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    # Forbidden pairs get a cost no allowed assignment can beat, then are dropped
+    span = np.abs(cost[finite]).max() + 1
+    filled = np.where(finite, cost, 2 * span * (min(cost.shape) + 1))
+
+    if scipy_assignment is not None:
+        rows, cols = scipy_assignment(filled)
+    elif cost.shape[0] <= cost.shape[1]:
+        rows = np.arange(cost.shape[0])
+        cols = hungarian(filled)
+    else:
+        cols = np.arange(cost.shape[1])
+        rows = hungarian(filled.T)
+        order = np.argsort(rows)
+        rows, cols = rows[order], cols[order]
+    keep = finite[rows, cols]
+    return rows[keep], cols[keep]
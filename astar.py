@@ -1,28 +1,212 @@
 import heapq
+from bisect import bisect_left, bisect_right
+import numpy as np
+import shapely
+from shapely import STRtree
 from shapely.geometry import LineString, Polygon
 
+MAP_BOUNDS = (0, 0, 100, 100)  # minx, miny, maxx, maxy, same as plot_map
+STEP_SIZE = 5  # lattice step of the grid and raster planners
+
 def heuristic(a, b):
     return ((a[0]-b[0])**2 + (a[1]-b[1])**2)**0.5
 
-def intersects_no_fly_zone(p1, p2, no_fly_zones):
+def arrival_time(start_time, distance, speed):
+    """Time at which a drone leaving at `start_time` has flown `distance`.
+
+    Returns None when planning without time, and `start_time` itself when
+    the speed is unknown, so zones are then taken as active at departure.
+    """
+    if start_time is None:
+        return None
+    if not speed:
+        return start_time
+    return start_time + distance / speed
+
+def zone_active(time_window, t0, t1=None):
+    """Whether a zone's time window overlaps the interval [t0, t1]"""
+    if t0 is None or time_window is None:
+        return True
+    if t1 is None:
+        t1 = t0
+    return time_window[0] <= t1 and t0 <= time_window[1]
+
+class ZoneIndex:
+    """Prepared no-fly-zone polygons behind an STRtree.
+
+    Build it once from the zone list and rebuild it only when zones change;
+    every planner accepts it wherever a `no_fly_zones` list is expected.
+    """
+
+    def __init__(self, no_fly_zones):
+        self.zones = list(no_fly_zones)
+        self.polygons = [Polygon(zone["polygon"]) for zone in self.zones]
+        self.time_windows = [zone.get("time_window") for zone in self.zones]
+        for poly in self.polygons:
+            shapely.prepare(poly)
+        self.tree = STRtree(self.polygons)
+        self._occupancy = None
+        self._visibility = None
+
+    def __len__(self):
+        return len(self.zones)
+
+    def __iter__(self):
+        return iter(self.zones)
+
+    def intersects(self, p1, p2, t0=None, t1=None):
+        """Whether the segment p1-p2 touches any zone active during [t0, t1]"""
+        # The tree prunes by bounding box, the prepared polygons do the exact test
+        line = LineString([p1, p2])
+        for i in self.tree.query(line):
+            if zone_active(self.time_windows[i], t0, t1) and self.polygons[i].intersects(line):
+                return True
+        return False
+
+    def occupancy(self):
+        """The OccupancyGrid for these zones, rasterized on first use"""
+        if self._occupancy is None:
+            self._occupancy = OccupancyGrid(self)
+        return self._occupancy
+
+    def visibility(self):
+        """The VisibilityGraph for these zones, built on first use"""
+        if self._visibility is None:
+            self._visibility = VisibilityGraph(self)
+        return self._visibility
+
+# Lattice directions, indexed the same way as OccupancyGrid.blocked_edges
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+class OccupancyGrid:
+    """No-fly zones rasterized onto a fixed lattice over the map bounds.
+
+    For every zone it precomputes which lattice nodes it covers and which
+    lattice edges it blocks. Layers for a given set of active zones are
+    OR-ed together from those once and reused for every time interval with
+    the same activity, so collision tests in the planner are array lookups.
+    """
+
+    def __init__(self, no_fly_zones, step=STEP_SIZE, bounds=MAP_BOUNDS):
+        index = zone_index(no_fly_zones)
+        self.step = step
+        self.bounds = bounds
+        self.xs = np.arange(bounds[0], bounds[2] + step / 2, step, dtype=float)
+        self.ys = np.arange(bounds[1], bounds[3] + step / 2, step, dtype=float)
+        nx, ny = len(self.xs), len(self.ys)
+
+        # Lattice points and the edge leaving each point in each direction
+        gx, gy = np.meshgrid(self.xs, self.ys, indexing="ij")
+        points = shapely.points(gx, gy)
+        di = np.array([d[0] for d in DIRECTIONS])[:, None, None]
+        dj = np.array([d[1] for d in DIRECTIONS])[:, None, None]
+        ni = np.arange(nx)[None, :, None] + di
+        nj = np.arange(ny)[None, None, :] + dj
+        inside = (ni >= 0) & (ni < nx) & (nj >= 0) & (nj < ny)
+        coords = np.zeros((len(DIRECTIONS), nx, ny, 2, 2))
+        coords[..., 0, 0] = gx
+        coords[..., 0, 1] = gy
+        coords[..., 1, 0] = gx + di * step
+        coords[..., 1, 1] = gy + dj * step
+        edges = shapely.linestrings(coords)
+
+        self.zone_nodes = np.zeros((len(index), nx, ny), dtype=bool)
+        self.zone_edges = np.zeros((len(index), len(DIRECTIONS), nx, ny), dtype=bool)
+        for z, poly in enumerate(index.polygons):
+            self.zone_nodes[z] = shapely.intersects(points, poly)
+            self.zone_edges[z] = shapely.intersects(edges, poly)
+        self.off_grid = ~inside
+
+        windows = [w if w is not None else (-np.inf, np.inf) for w in index.time_windows]
+        self.window_start = np.array([w[0] for w in windows], dtype=float).reshape(-1)
+        self.window_end = np.array([w[1] for w in windows], dtype=float).reshape(-1)
+        self.breakpoints = sorted(set(self.window_start) | set(self.window_end))
+        self.layers = {}
+        self.interval_layers = {}
+
+    def layer(self, t0=None, t1=None):
+        """(blocked nodes, blocked edges) for zones active during [t0, t1]"""
+        if t0 is None:
+            key = None
+        else:
+            # Zone activity over [t0, t1] depends only on how many window
+            # bounds lie before t0 and up to t1
+            key = (bisect_left(self.breakpoints, t0), bisect_right(self.breakpoints, t1))
+        layer = self.interval_layers.get(key)
+        if layer is None:
+            if t0 is None:
+                active = np.ones(len(self.window_start), dtype=bool)
+            else:
+                active = (self.window_start <= t1) & (t0 <= self.window_end)
+            mask = active.tobytes()
+            layer = self.layers.get(mask)
+            if layer is None:
+                nodes = self.zone_nodes[active].any(axis=0)
+                edges = self.zone_edges[active].any(axis=0) | self.off_grid
+                layer = (nodes, edges)
+                self.layers[mask] = layer
+            self.interval_layers[key] = layer
+        return layer
+
+    def cell(self, point):
+        """Lattice indices of the lower-left corner of the cell holding `point`"""
+        i = int(np.floor((point[0] - self.bounds[0]) / self.step))
+        j = int(np.floor((point[1] - self.bounds[1]) / self.step))
+        return (min(max(i, 0), len(self.xs) - 1), min(max(j, 0), len(self.ys) - 1))
+
+    def position(self, node):
+        return (float(self.xs[node[0]]), float(self.ys[node[1]]))
+
+def zone_index(no_fly_zones):
+    """Return `no_fly_zones` as a ZoneIndex, building one if needed"""
+    if isinstance(no_fly_zones, ZoneIndex):
+        return no_fly_zones
+    return ZoneIndex(no_fly_zones)
+
+def intersects_no_fly_zone(p1, p2, no_fly_zones, t0=None, t1=None):
+    """Whether the segment p1-p2 touches a zone active during [t0, t1].
+
+    Without a time every zone counts as active.
+    """
+    if isinstance(no_fly_zones, ZoneIndex):
+        return no_fly_zones.intersects(p1, p2, t0, t1)
     line = LineString([p1, p2])
     for zone in no_fly_zones:
-        poly = Polygon(zone["polygon"])
-        if line.crosses(poly) or line.within(poly) or line.intersects(poly):
+        if not zone_active(zone.get("time_window"), t0, t1):
+            continue
+        if line.intersects(Polygon(zone["polygon"])):
             return True
     return False
 
-def astar(start, goal, no_fly_zones, weight):
+def grid_astar(start, goal, no_fly_zones, weight, stats=None, max_expansions=None,
+               start_time=None, speed=None, bounds=MAP_BOUNDS):
+    """A* over an 8-connected lattice with a fixed step size.
+
+    Nodes further than one step outside `bounds` are never generated.
+    """
+    expansions = 0
     open_set = []
     heapq.heappush(open_set, (0, start))
     came_from = {}
     g_score = {start: 0}
     f_score = {start: heuristic(start, goal)}
+    closed = set()
 
-    step_size = 5  # adım büyüklüğü
+    step_size = STEP_SIZE  # adım büyüklüğü
+    # bir adım dışarı taşmaya izin ver, kenardaki hedeflere ulaşılabilsin
+    min_x, min_y = bounds[0] - step_size, bounds[1] - step_size
+    max_x, max_y = bounds[2] + step_size, bounds[3] + step_size
 
     while open_set:
         current = heapq.heappop(open_set)[1]
+        if current in closed:
+            continue
+        closed.add(current)
+        expansions += 1
+        if stats is not None:
+            stats['expansions'] = stats.get('expansions', 0) + 1
+        if max_expansions is not None and expansions > max_expansions:
+            return None
         if heuristic(current, goal) < step_size:
             # hedefe yaklaştık
             path = []
@@ -38,14 +222,300 @@ def astar(start, goal, no_fly_zones, weight):
                 if dx == 0 and dy == 0:
                     continue
                 neighbor = (current[0] + dx, current[1] + dy)
+                if neighbor in closed:
+                    continue
+                if not (min_x <= neighbor[0] <= max_x and min_y <= neighbor[1] <= max_y):
+                    continue
                 tentative_g = g_score[current] + heuristic(current, neighbor)
+                if neighbor in g_score and tentative_g >= g_score[neighbor]:
+                    continue
 
-                if intersects_no_fly_zone(current, neighbor, no_fly_zones):
+                if intersects_no_fly_zone(current, neighbor, no_fly_zones,
+                                          arrival_time(start_time, g_score[current], speed),
+                                          arrival_time(start_time, tentative_g, speed)):
                     continue
 
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + heuristic(neighbor, goal)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                f_score[neighbor] = tentative_g + heuristic(neighbor, goal)
+                heapq.heappush(open_set, (f_score[neighbor], neighbor))
     return None
+
+def visibility_nodes(no_fly_zones, clearance=0.5, bounds=MAP_BOUNDS):
+    """Corner points of every no-fly zone, pushed outwards by `clearance`.
+
+    Shortest paths around polygonal obstacles bend only at obstacle corners.
+    The corners are offset slightly so that legs between them do not touch
+    the zone boundary, which `intersects_no_fly_zone` counts as a collision.
+    Corners outside `bounds` are dropped.
+    """
+    nodes = []
+    for zone in no_fly_zones:
+        inflated = Polygon(zone["polygon"]).buffer(clearance, join_style="mitre")
+        if inflated.is_empty or inflated.geom_type != "Polygon":
+            continue
+        nodes.extend(tuple(p) for p in inflated.exterior.coords[:-1]
+                     if bounds[0] <= p[0] <= bounds[2] and bounds[1] <= p[1] <= bounds[3])
+    return nodes
+
+class VisibilityGraph:
+    """Zone corners and the zones each corner-to-corner leg crosses.
+
+    Built once per ZoneIndex: every leg between two corners is tested
+    against the zone tree a single time, and the (leg, zone) hits are kept
+    per source corner. Whether a leg is clear for a given time interval
+    is then an array test of those zones' windows, so a query only has to
+    connect its start and goal to the corners.
+    """
+
+    def __init__(self, no_fly_zones, clearance=0.5, bounds=MAP_BOUNDS):
+        self.index = zone_index(no_fly_zones)
+        self.nodes = visibility_nodes(self.index, clearance, bounds)
+        self.points = np.array(self.nodes, dtype=float).reshape(-1, 2)
+        n = len(self.nodes)
+        self.dist = np.hypot(self.points[:, None, 0] - self.points[None, :, 0],
+                             self.points[:, None, 1] - self.points[None, :, 1])
+
+        windows = [w if w is not None else (-np.inf, np.inf) for w in self.index.time_windows]
+        self.window_start = np.array([w[0] for w in windows], dtype=float).reshape(-1)
+        self.window_end = np.array([w[1] for w in windows], dtype=float).reshape(-1)
+
+        i, j = np.triu_indices(n, k=1)
+        legs, zones = self.crossings(self.points[i], self.points[j])
+        # Hits in both directions, grouped by source corner
+        src = np.concatenate([i[legs], j[legs]])
+        dst = np.concatenate([j[legs], i[legs]])
+        zones = np.concatenate([zones, zones])
+        order = np.argsort(src, kind="stable")
+        self.hit_targets = dst[order]
+        self.hit_zones = zones[order]
+        self.hit_offsets = np.searchsorted(src[order], np.arange(n + 1))
+
+    def crossings(self, starts, ends):
+        """(leg, zone) index pairs for every leg starts[k]-ends[k] touching a zone"""
+        if not len(starts) or not len(self.index):
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        lines = shapely.linestrings(np.stack([starts, ends], axis=1))
+        return self.index.tree.query(lines, predicate="intersects")
+
+    def hits(self, node):
+        """(target corners, zones) of the blocked legs leaving corner `node`"""
+        lo, hi = self.hit_offsets[node], self.hit_offsets[node + 1]
+        return self.hit_targets[lo:hi], self.hit_zones[lo:hi]
+
+    def blocked(self, targets, zones, n, t0=None, t1=None):
+        """(n,) mask of targets whose leg crosses a zone active during [t0, t1[target]]"""
+        mask = np.zeros(n, dtype=bool)
+        if t0 is not None:
+            active = (self.window_start[zones] <= t1[targets]) & (t0 <= self.window_end[zones])
+            targets = targets[active]
+        mask[targets] = True
+        return mask
+
+def visibility_astar(start, goal, no_fly_zones, weight, stats=None, max_expansions=None,
+                     start_time=None, speed=None):
+    """A* over the visibility graph of the no-fly-zone corners.
+
+    Returns an any-angle shortest path from `start` to exactly `goal`. The
+    corner graph is cached on the ZoneIndex (see VisibilityGraph); each
+    call only tests the legs leaving `start`, and the leg to `goal` from
+    each corner it expands. Corners
+    outside MAP_BOUNDS are not used, so with `start` and `goal` on the map
+    the path stays on it, like the lattice planners.
+    """
+    graph = zone_index(no_fly_zones).visibility()
+    n = len(graph.nodes)
+    goal_node, start_node = n, n + 1  # corners are 0..n-1
+    to_goal = np.hypot(graph.points[:, 0] - goal[0], graph.points[:, 1] - goal[1])
+    from_start = np.append(np.hypot(graph.points[:, 0] - start[0], graph.points[:, 1] - start[1]),
+                           heuristic(start, goal))
+    start_legs, start_zones = graph.crossings(np.tile(start, (n + 1, 1)),
+                                              np.vstack([graph.points, [goal]]))
+
+    def position(node):
+        if node == start_node:
+            return start
+        if node == goal_node:
+            return goal
+        return graph.nodes[node]
+
+    def time(distance):
+        if start_time is None:
+            return None
+        if not speed:
+            return np.full(np.shape(distance), start_time, dtype=float)
+        return start_time + np.asarray(distance) / speed
+
+    g_score = np.full(n + 2, np.inf)
+    g_score[start_node] = 0
+    came_from = {}
+    closed = np.zeros(n + 2, dtype=bool)
+    open_set = [(heuristic(start, goal), start_node)]
+
+    while open_set:
+        current = heapq.heappop(open_set)[1]
+        if closed[current]:
+            continue
+        closed[current] = True
+        if stats is not None:
+            stats['expansions'] = stats.get('expansions', 0) + 1
+        if max_expansions is not None and closed.sum() > max_expansions:
+            return None
+        if current == goal_node:
+            path = []
+            while current in came_from:
+                path.append(position(current))
+                current = came_from[current]
+            path.append(start)
+            path.reverse()
+            return path
+
+        g = g_score[current]
+        if current == start_node:
+            lengths = from_start
+            tentative = g + lengths
+            t0, t1 = time(g), time(tentative)
+            blocked = graph.blocked(start_legs, start_zones, n + 1, t0, t1)
+        else:
+            lengths = np.append(graph.dist[current], to_goal[current])
+            tentative = g + lengths
+            t0, t1 = time(g), time(tentative)
+            targets, zones = graph.hits(current)
+            goal_hit = graph.crossings(graph.points[[current]], np.array([goal], dtype=float))[1]
+            blocked = graph.blocked(np.append(targets, np.full(len(goal_hit), goal_node)),
+                                    np.append(zones, goal_hit), n + 1, t0, t1)
+            blocked[current] = True  # no zero-length self loop
+
+        better = ~blocked & ~closed[:n + 1] & (tentative < g_score[:n + 1])
+        for neighbor in np.flatnonzero(better).tolist():
+            g_score[neighbor] = tentative[neighbor]
+            came_from[neighbor] = current
+            heapq.heappush(open_set, (tentative[neighbor] + heuristic(position(neighbor), goal),
+                                      neighbor))
+    return None
+
+def raster_astar(start, goal, no_fly_zones, weight, stats=None, max_expansions=None,
+                 start_time=None, speed=None):
+    """A* over the rasterized OccupancyGrid lattice.
+
+    Lattice edges are checked with array lookups into the precomputed
+    layers. Only the legs joining `start` and `goal` to the lattice use an
+    exact shapely test, so the path starts and ends exactly at both points.
+    """
+    index = zone_index(no_fly_zones)
+    grid = index.occupancy()
+    step = grid.step
+    nx, ny = len(grid.xs), len(grid.ys)
+
+    def position(node):
+        if node == "start":
+            return start
+        if node == "goal":
+            return goal
+        return grid.position(node)
+
+    def leg_clear(p1, p2, g1, g2):
+        return not intersects_no_fly_zone(p1, p2, index,
+                                          arrival_time(start_time, g1, speed),
+                                          arrival_time(start_time, g2, speed))
+
+    counter = 0  # ties between "start"/"goal" and index tuples
+    open_set = [(heuristic(start, goal), counter, "start")]
+    came_from = {}
+    g_score = {"start": 0}
+    closed = set()
+
+    while open_set:
+        current = heapq.heappop(open_set)[2]
+        if current in closed:
+            continue
+        closed.add(current)
+        if stats is not None:
+            stats['expansions'] = stats.get('expansions', 0) + 1
+        if max_expansions is not None and len(closed) > max_expansions:
+            return None
+        if current == "goal":
+            path = []
+            while current in came_from:
+                path.append(position(current))
+                current = came_from[current]
+            path.append(start)
+            path.reverse()
+            return path
+
+        current_pos = position(current)
+        g = g_score[current]
+        candidates = []
+        if current == "start":
+            i, j = grid.cell(start)
+            for node in [(i, j), (i + 1, j), (i, j + 1), (i + 1, j + 1)]:
+                if node[0] >= nx or node[1] >= ny:
+                    continue
+                length = heuristic(start, grid.position(node))
+                nodes, edges = grid.layer(arrival_time(start_time, g, speed),
+                                          arrival_time(start_time, g + length, speed))
+                if nodes[node]:
+                    continue
+                if leg_clear(start, grid.position(node), g, g + length):
+                    candidates.append((node, length))
+        else:
+            i, j = current
+            t0 = arrival_time(start_time, g, speed)
+            straight = grid.layer(t0, arrival_time(start_time, g + step, speed))[1]
+            diagonal = grid.layer(t0, arrival_time(start_time, g + step * 2 ** 0.5, speed))[1]
+            for d, (di, dj) in enumerate(DIRECTIONS):
+                if di == 0 or dj == 0:
+                    length, edges = step, straight
+                else:
+                    length, edges = step * 2 ** 0.5, diagonal
+                if not edges[d, i, j]:
+                    candidates.append(((i + di, j + dj), length))
+        if heuristic(current_pos, goal) <= 1.5 * step:
+            length = heuristic(current_pos, goal)
+            if leg_clear(current_pos, goal, g, g + length):
+                candidates.append(("goal", length))
+
+        for neighbor, length in candidates:
+            if neighbor in closed:
+                continue
+            tentative_g = g + length
+            if neighbor in g_score and tentative_g >= g_score[neighbor]:
+                continue
+            came_from[neighbor] = current
+            g_score[neighbor] = tentative_g
+            counter += 1
+            heapq.heappush(open_set, (tentative_g + heuristic(position(neighbor), goal),
+                                      counter, neighbor))
+    return None
+
+def goal_tolerance(planner):
+    """How far short of the goal a planner's path may end"""
+    # grid_astar stops once it is within one step of the goal
+    return STEP_SIZE if planner == "grid" else 0
+
+PLANNERS = {
+    "grid": grid_astar,
+    "visibility": visibility_astar,
+    "raster": raster_astar,
+}
+
+def astar(start, goal, no_fly_zones, weight, planner="grid", stats=None,
+          max_expansions=None, start_time=None, speed=None):
+    """Plan a path from `start` to `goal` with the selected planner.
+
+    `no_fly_zones` may be a zone list or a prebuilt ZoneIndex; pass the
+    index when planning repeatedly against the same zones. `stats`, if
+    given, is a dict whose 'expansions' counter is incremented for every
+    node taken off the open set. `max_expansions` gives up and returns None
+    once that many nodes have been expanded.
+
+    With a `start_time` the search is time-aware: the time at each node is
+    estimated from the distance flown and `speed`, and a leg is only
+    checked against zones whose time window overlaps the time spent on it.
+    Without a `start_time` every zone is treated as always active.
+    """
+    if planner not in PLANNERS:
+        raise ValueError(f"Unknown planner: {planner}")
+    return PLANNERS[planner](start, goal, zone_index(no_fly_zones), weight,
+                             stats=stats, max_expansions=max_expansions,
+                             start_time=start_time, speed=speed)
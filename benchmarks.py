@@ -0,0 +1,348 @@
+import argparse
+import copy
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from astar import astar, zone_index, PLANNERS
+from data import drones, deliveries, no_fly_zones
+from genetic_algorithm import build_problem, evaluate_population, optimize_routes
+from local_search import optimize_routes_local
+from plot_utils import plot_map
+from scenarios import generate_scenario
+from simulation import SimulationEngine
+from utils import batch_energy, calculate_energy, flatten_paths, path_length
+
+# (drones, deliveries, zones) of the benchmark suite's scenarios
+SIZES = {
+    'small': (5, 20, 3),
+    'medium': (20, 200, 15),
+    'large': (100, 2000, 60),
+}
+BASELINE = "benchmark_baseline.json"
+# Growth below these absolute amounts is noise, whatever the ratio
+FLOORS = {'wall_time': 0.005, 'peak_memory': 64 * 1024}
+
+def bench_planners(drones, deliveries, no_fly_zones, planners=None, max_expansions=5000):
+    """Plan every drone start -> delivery pair with each planner.
+
+    Returns one result dict per planner with node expansions, wall time
+    and total path length over all pairs. Searches are capped at
+    `max_expansions` because the grid planner never terminates on
+    unreachable goals; capped searches count as failed.
+    """
+    planners = planners or list(PLANNERS)
+    index = zone_index(no_fly_zones)
+    results = []
+    for planner in planners:
+        stats = {'expansions': 0}
+        total_length = 0
+        failed = 0
+        started = time.perf_counter()
+        for drone in drones:
+            for delivery in deliveries:
+                path = astar(drone['start_pos'], delivery['pos'], index,
+                             delivery['weight'], planner=planner, stats=stats,
+                             max_expansions=max_expansions)
+                if path:
+                    total_length += path_length(path)
+                else:
+                    failed += 1
+        elapsed = time.perf_counter() - started
+        results.append({
+            'planner': planner,
+            'pairs': len(drones) * len(deliveries),
+            'expansions': stats['expansions'],
+            'wall_time': elapsed,
+            'path_length': total_length,
+            'failed': failed,
+        })
+    return results
+
+def bench_optimizers(drones, deliveries, no_fly_zones, generations=(10, 50, 200),
+                     iterations=(2000, 20000, 100000), seed=0):
+    """Solution cost against wall time for the GA and the local search.
+
+    Every plan is scored with the GA's full cost function, so the rows are
+    comparable across optimizers.
+    """
+    problem = build_problem(drones, deliveries)
+    results = []
+    for n_gen in generations:
+        random.seed(seed)
+        started = time.perf_counter()
+        best, _ = optimize_routes(drones, deliveries, no_fly_zones, n_gen=n_gen, verbose=False)
+        results.append({
+            'optimizer': 'ga',
+            'budget': f'{n_gen} gen',
+            'wall_time': time.perf_counter() - started,
+            'cost': float(evaluate_population(problem, [best])[0]),
+        })
+    for temperature in (None, 20):
+        for n_iter in iterations:
+            started = time.perf_counter()
+            best = optimize_routes_local(drones, deliveries, no_fly_zones, iterations=n_iter,
+                                         temperature=temperature, seed=seed)
+            results.append({
+                'optimizer': 'anneal' if temperature else 'local',
+                'budget': f'{n_iter} it',
+                'wall_time': time.perf_counter() - started,
+                'cost': float(evaluate_population(problem, [best])[0]),
+            })
+    return results
+
+def sample_pairs(scenario, n, seed=0):
+    """`n` fixed (start, goal, weight) planning jobs from a scenario"""
+    drones, deliveries, _ = scenario
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(n):
+        delivery = rng.choice(deliveries)
+        jobs.append((rng.choice(drones)['start_pos'], delivery['pos'], delivery['weight']))
+    return jobs
+
+# Each suite case takes a scenario and returns (setup, run). `setup()` is
+# untimed and its result is passed to `run`, which returns counters:
+# 'evaluations' for the throughput, plus anything else worth tracking.
+
+def case_astar(scenario, pairs=50, max_expansions=5000):
+    index = zone_index(scenario[2])
+    jobs = sample_pairs(scenario, pairs)
+
+    def run(_):
+        stats = {'expansions': 0}
+        for start, goal, weight in jobs:
+            astar(start, goal, index, weight, stats=stats, max_expansions=max_expansions)
+        return {'evaluations': len(jobs), 'expansions': stats['expansions']}
+    return lambda: None, run
+
+def case_energy(scenario, pairs=200, rounds=20):
+    index = zone_index(scenario[2])
+    drones = scenario[0]
+    paths = [(path, drones[i % len(drones)], weight)
+             for i, (start, goal, weight) in enumerate(sample_pairs(scenario, pairs))
+             for path in [astar(start, goal, index, weight, planner="visibility")] if path]
+
+    def run(_):
+        for _ in range(rounds):
+            for path, drone, weight in paths:
+                calculate_energy(path, drone, weight)
+        return {'evaluations': rounds * len(paths)}
+    return lambda: None, run
+
+def case_batch_energy(scenario, pairs=200, rounds=20):
+    """The legs of `case_energy`, scored with one `batch_energy` call per round"""
+    index = zone_index(scenario[2])
+    drones = scenario[0]
+    legs = [(path, drones[i % len(drones)], weight)
+            for i, (start, goal, weight) in enumerate(sample_pairs(scenario, pairs))
+            for path in [astar(start, goal, index, weight, planner="visibility")] if path]
+
+    def setup():
+        points, offsets = flatten_paths([path for path, _, _ in legs])
+        return (points, offsets, np.array([d['max_weight'] for _, d, _ in legs]),
+                np.array([d['speed'] for _, d, _ in legs]), np.array([w for _, _, w in legs]))
+
+    def run(batch):
+        for _ in range(rounds):
+            batch_energy(*batch)
+        return {'evaluations': rounds * len(legs)}
+    return setup, run
+
+def case_optimize(scenario, pop_size=50, n_gen=10):
+    def run(_):
+        random.seed(0)
+        _, logbook = optimize_routes(*scenario, pop_size=pop_size, n_gen=n_gen, verbose=False)
+        return {'evaluations': sum(logbook.select('nevals'))}
+    return lambda: None, run
+
+def case_simulation_step(scenario, start_time=30, policy="greedy"):
+    """The first step of a run started at `start_time`.
+
+    Every delivery whose window is open by then opens at once and all
+    drones are idle, so this is the busiest dispatch a step can face.
+    """
+    def setup():
+        engine = SimulationEngine(*copy.deepcopy(scenario), policy=policy)
+        engine.reset()
+        engine.start(start_time)
+        return engine
+
+    def run(engine):
+        engine.step()
+        return {'evaluations': engine.events_handled, 'planner_calls': engine.path_cache.misses,
+                'searches_saved': engine.prefilter['searches_saved']}
+    return setup, run
+
+def case_plot_map(scenario):
+    def setup():
+        engine = SimulationEngine(*copy.deepcopy(scenario))
+        engine.reset()
+        figure = Figure(figsize=(8, 8))
+        return engine, figure.add_subplot(111), FigureCanvasAgg(figure)
+
+    def run(state):
+        engine, ax, canvas = state
+        plot_map(ax, engine.drones, engine.deliveries, engine.no_fly_zones)
+        canvas.draw()
+        return {'evaluations': 1}
+    return setup, run
+
+CASES = {
+    'astar': case_astar,
+    'calculate_energy': case_energy,
+    'batch_energy': case_batch_energy,
+    'optimize_routes': case_optimize,
+    'simulation_step': case_simulation_step,
+    'assignment_step': lambda scenario: case_simulation_step(scenario, policy="assignment"),
+    'plot_map': case_plot_map,
+}
+
+def measure(setup, run, repeat=7, min_time=1.0):
+    """Median wall time over the runs, plus peak traced memory from one extra run.
+
+    Runs at least `repeat` times and until `min_time` seconds have been
+    timed, so quick cases are sampled over more than one burst of machine
+    load. The memory run starts from a collected heap and its own trace, so its
+    peak does not depend on the garbage left by earlier cases.
+    """
+    times = []
+    while len(times) < repeat or sum(times) < min_time:
+        state = setup()
+        started = time.perf_counter()
+        counters = run(state)
+        times.append(time.perf_counter() - started)
+    wall_time = float(np.median(times))
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(state)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {'wall_time': wall_time, 'peak_memory': peak_memory}
+    result.update(counters)
+    result['evals_per_second'] = counters['evaluations'] / wall_time if wall_time else 0.0
+    return result
+
+def run_suite(cases=None, sizes=None, repeat=7, seed=0):
+    """Run every case on every scenario size; returns the JSON-ready report"""
+    results = []
+    for size in sizes or list(SIZES):
+        scenario = generate_scenario(*SIZES[size], seed=seed)
+        for name in cases or list(CASES):
+            setup, run = CASES[name](scenario)
+            result = {'case': name, 'size': size}
+            result.update(measure(setup, run, repeat))
+            print(f"{name:<18}{size:<8}{result['wall_time']:>10.4f}s"
+                  f"{result['peak_memory'] / 1e6:>10.1f}MB", file=sys.stderr)
+            results.append(result)
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(baseline, current, tolerance=0.2):
+    """Rows of (case, size, metric, baseline, current, ratio, regressed).
+
+    Time and memory regress when they grow by more than `tolerance` and
+    by more than their `FLOORS` amount; node expansions and planner calls
+    are deterministic, so any growth counts.
+    """
+    old = {(r['case'], r['size']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = old.get((result['case'], result['size']))
+        if before is None:
+            continue
+        for metric, allowed in [('wall_time', tolerance), ('peak_memory', tolerance),
+                                ('expansions', 0), ('planner_calls', 0)]:
+            if metric not in result or metric not in before:
+                continue
+            ratio = result[metric] / before[metric] if before[metric] else 1.0
+            rows.append({
+                'case': result['case'],
+                'size': result['size'],
+                'metric': metric,
+                'baseline': before[metric],
+                'current': result[metric],
+                'ratio': ratio,
+                'regressed': (ratio > 1 + allowed
+                              and result[metric] - before[metric] > FLOORS.get(metric, 0)),
+            })
+    return rows
+
+def print_table(rows):
+    columns = list(dict.fromkeys(c for row in rows for c in row))
+    widths = [max(14, len(c) + 2) for c in columns]
+    print("".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        cells = [row.get(c, "") for c in columns]
+        print("".join(f"{v:>{w}.3f}" if isinstance(v, float) else f"{v!s:>{w}}"
+                      for v, w in zip(cells, widths)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite = commands.add_parser("run", help="run the benchmark suite and write JSON")
+    suite.add_argument("--case", action="append", choices=list(CASES))
+    suite.add_argument("--size", action="append", choices=list(SIZES))
+    suite.add_argument("--repeat", type=int, default=7)
+    suite.add_argument("--out", default="benchmark_results.json")
+
+    check = commands.add_parser("compare", help="flag regressions against a baseline")
+    check.add_argument("current", nargs="?", default="benchmark_results.json")
+    check.add_argument("--baseline", default=BASELINE)
+    check.add_argument("--tolerance", type=float, default=0.2)
+
+    commands.add_parser("planners", help="compare the path planners on data.py")
+    commands.add_parser("optimizers", help="cost against time for the route optimizers")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_suite(args.case, args.size, args.repeat)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print_table(report['results'])
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.tolerance)
+        print_table(rows)
+        regressions = [r for r in rows if r['regressed']]
+        for r in regressions:
+            print(f"REGRESSION {r['case']}/{r['size']} {r['metric']}: "
+                  f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    elif args.command == "planners":
+        print_table(bench_planners(drones, deliveries, no_fly_zones))
+    else:
+        print_table(bench_optimizers(drones, deliveries, no_fly_zones))
+        print()
+        print_table(bench_optimizers(*generate_scenario(10, 200, 0)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
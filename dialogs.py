@@ -43,6 +43,12 @@ class AddDroneDialog(QDialog):
         self.weight_input.setValue(10)
         layout.addRow("Max Weight (kg):", self.weight_input)
         
+        # Speed
+        self.speed_input = QDoubleSpinBox()
+        self.speed_input.setRange(1, 50)
+        self.speed_input.setValue(10)
+        layout.addRow("Speed:", self.speed_input)
+        
         # Buttons
         button_layout = QHBoxLayout()
         save_btn = QPushButton("Save")
@@ -59,6 +65,7 @@ class AddDroneDialog(QDialog):
             'start_pos': (self.x_input.value(), self.y_input.value()),
             'battery': self.battery_input.value(),
             'max_weight': self.weight_input.value(),
+            'speed': self.speed_input.value(),
             'current_pos': (self.x_input.value(), self.y_input.value()),
             'battery_left': self.battery_input.value()
         }
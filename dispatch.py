@@ -0,0 +1,168 @@
+import numpy as np
+
+from assignment import min_cost_assignment
+from utils import calculate_delivery_score, sort_deliveries_by_priority
+
+# A dispatch policy has one method, dispatch(engine, deliveries, drones),
+# called by SimulationEngine with the open deliveries and the idle drones.
+# It checks pairs with engine.plan(drone, delivery), which returns
+# (path, energy) or None, or with engine.plan_many(pairs) for a batch, and
+# sends drones off with engine.commit(drone, delivery, path, energy).
+# Policies that drop pairs using engine.lower_bounds() rather than plan()
+# add them to engine.prefilter['searches_saved'].
+
+class GreedyPolicy:
+    """Most urgent delivery first, each to the first drone that can fly it.
+
+    The drone from the last optimized plan is tried first. Up to one
+    planner call per (delivery, drone) pair.
+    """
+
+    def dispatch(self, engine, deliveries, drones):
+        drones = list(drones)
+        for delivery in sort_deliveries_by_priority(deliveries, engine.current_time):
+            if not drones:
+                break
+            planned = engine.planned_drone.get(id(delivery))
+            for drone in sorted(drones, key=lambda d: engine.drone_rows[id(d)] != planned):
+                plan = engine.plan(drone, delivery)
+                if plan:
+                    engine.commit(drone, delivery, *plan)
+                    drones.remove(drone)
+                    break
+
+class NearestPolicy(GreedyPolicy):
+    """Greedy, but each delivery only tries its `neighbours` nearest idle drones.
+
+    Candidates come from the engine's spatial index of idle drones,
+    nearest first, with the drone from the last optimized plan ahead of
+    them when it is idle.
+    """
+
+    def __init__(self, neighbours=8):
+        self.neighbours = neighbours
+
+    def dispatch(self, engine, deliveries, drones):
+        available = {id(d): d for d in drones}
+        for delivery in sort_deliveries_by_priority(deliveries, engine.current_time):
+            if not available:
+                break
+            candidates = engine.drone_grid.nearest(delivery['pos'], self.neighbours,
+                                                   where=lambda d: id(d) in available)
+            planned = engine.planned_drone.get(id(delivery))
+            candidates.sort(key=lambda d: engine.drone_rows[id(d)] != planned)
+            for drone in candidates:
+                plan = engine.plan(drone, delivery)
+                if plan:
+                    engine.commit(drone, delivery, *plan)
+                    del available[id(drone)]
+                    break
+
+class AssignmentPolicy:
+    """Minimum-cost matching of idle drones to open deliveries.
+
+    Pair costs are energy minus `priority_weight` times the delivery
+    score of `utils.calculate_delivery_score`, so scarce drones go to
+    urgent, high-priority packages first. The engine's prefilter bounds
+    (see `SimulationEngine.screen`) rule out infeasible pairs. Each drone
+    shortlists its `shortlist` cheapest deliveries (each delivery its
+    cheapest drones, when deliveries are the fewer), and only shortlisted
+    pairs get an exact path. The matching over exact costs is solved in
+    one shot; whoever is left unmatched shortlists again, for up to
+    `rounds` rounds.
+
+    With `neighbours` set, costs are only estimated between each member
+    of the smaller side and its `neighbours` nearest partners, looked up
+    in the engine's spatial indexes, so the cost matrix stays narrow when
+    both sides are large.
+    """
+
+    def __init__(self, shortlist=5, priority_weight=1000, rounds=3, neighbours=20):
+        self.shortlist = shortlist
+        self.priority_weight = priority_weight
+        self.rounds = rounds
+        self.neighbours = neighbours
+
+    def candidates(self, engine, deliveries, drones):
+        """Drones, deliveries and a mask of the pairs worth estimating"""
+        if not self.neighbours or min(len(deliveries), len(drones)) * self.neighbours >= \
+                len(deliveries) * len(drones):
+            return deliveries, drones, None
+        if len(drones) <= len(deliveries):
+            near = [engine.open_grid.nearest(d['current_pos'], self.neighbours) for d in drones]
+            deliveries = list({id(d): d for row in near for d in row}.values())
+            mask = np.zeros((len(drones), len(deliveries)), dtype=bool)
+            col = {id(d): j for j, d in enumerate(deliveries)}
+            for i, row in enumerate(near):
+                mask[i, [col[id(d)] for d in row]] = True
+        else:
+            available = {id(d) for d in drones}
+            near = [engine.drone_grid.nearest(d['pos'], self.neighbours,
+                                              where=lambda drone: id(drone) in available)
+                    for d in deliveries]
+            drones = list({id(d): d for col in near for d in col}.values())
+            mask = np.zeros((len(drones), len(deliveries)), dtype=bool)
+            row = {id(d): i for i, d in enumerate(drones)}
+            for j, col in enumerate(near):
+                mask[[row[id(d)] for d in col], j] = True
+        return deliveries, drones, mask
+
+    def dispatch(self, engine, deliveries, drones):
+        deliveries, drones, mask = self.candidates(engine, deliveries, drones)
+        if not deliveries or not drones:
+            return
+        bonus = self.priority_weight * np.array(
+            [calculate_delivery_score(d, engine.current_time) for d in deliveries])
+        bounds = engine.lower_bounds(drones, deliveries)
+        screened_out = np.isinf(bounds) if mask is None else np.isinf(bounds) & mask
+        engine.prefilter['searches_saved'] += int(screened_out.sum())
+        candidates = bounds - bonus[None, :]
+        if mask is not None:
+            candidates[~mask] = np.inf
+        exact = np.full(candidates.shape, np.inf)
+        plans = {}
+        # Shortlist from the smaller side, so planner calls stay within shortlist * min(N, D)
+        by_drone = len(drones) <= len(deliveries)
+        choices = candidates if by_drone else candidates.T
+        k = min(self.shortlist, choices.shape[1])
+        waiting = np.arange(choices.shape[0])
+
+        for _ in range(self.rounds):
+            shortlist = np.argpartition(choices[waiting], k - 1, axis=1)[:, :k]
+            pairs = []
+            for a, row in zip(waiting, shortlist):
+                for b in row:
+                    if not np.isfinite(choices[a, b]):
+                        continue
+                    choices[a, b] = np.inf
+                    pairs.append((a, b) if by_drone else (b, a))
+            # Paths one by one, then the energy of the whole shortlist in one pass
+            for (i, j), plan in zip(pairs, engine.plan_many([(drones[i], deliveries[j])
+                                                             for i, j in pairs])):
+                if plan:
+                    exact[i, j] = plan[1] - bonus[j]
+                    plans[i, j] = plan
+
+            rows, cols = min_cost_assignment(exact)
+            matched = np.zeros(choices.shape[0], dtype=bool)
+            matched[rows if by_drone else cols] = True
+            waiting = np.flatnonzero(~matched & np.isfinite(choices).any(axis=1))
+            if not len(waiting):
+                break
+
+        for i, j in zip(rows, cols):
+            engine.commit(drones[i], deliveries[j], *plans[i, j])
+
+POLICIES = {
+    'greedy': GreedyPolicy,
+    'nearest': NearestPolicy,
+    'assignment': AssignmentPolicy,
+}
+
+def make_policy(policy):
+    """A policy instance from a `POLICIES` name, or the instance itself"""
+    if isinstance(policy, str):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown dispatch policy: {policy}")
+        return POLICIES[policy]()
+    return policy
@@ -1,9 +1,10 @@
 import sys
 import traceback
+from time import perf_counter
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QTextEdit, QLabel, QLineEdit, QFormLayout, QDialog,
-    QMessageBox, QMenuBar, QMenu, QAction, QTabWidget, QSplitter,
+    QMessageBox, QMenuBar, QMenu, QAction, QActionGroup, QTabWidget, QSplitter,
     QTableWidget, QTableWidgetItem, QHeaderView
 )
 from PyQt5.QtCore import Qt, QPoint, QTimer
@@ -15,16 +16,19 @@ from datetime import datetime, time
 import numpy as np
 from shapely.geometry import Polygon, Point
 
-from astar import astar
+from dispatch import make_policy
+from simulation import SimulationEngine
 from data import drones, deliveries, no_fly_zones
-from plot_utils import plot_map, animate_drone_path, plot_statistics
-from utils import (
-    calculate_distance, calculate_energy, check_time_window,
-    is_drone_available, get_available_drones, get_available_deliveries,
-    calculate_delivery_score, sort_deliveries_by_priority
-)
+from plot_utils import plot_map, animate_drone_path, plot_statistics, plot_convergence
 from dialogs import AddDroneDialog, AddDeliveryDialog, AddNoFlyZoneDialog
-from genetic_algorithm import optimize_routes
+from genetic_algorithm import decode_routes
+from optimizer_thread import OptimizerThread
+
+# Simulated minutes per wall-clock second at 1x (the old 5 minutes per 500 ms step)
+BASE_PACE = 10
+# Multiples of BASE_PACE; None steps as fast as possible
+TIME_SCALES = [('1x', 1), ('10x', 10), ('100x', 100), ('As Fast As Possible', None)]
+FRAME_RATE = 20  # map redraws per second, at most
 
 class DroneSimWindow(QMainWindow):
     def __init__(self):
@@ -38,6 +42,19 @@ class DroneSimWindow(QMainWindow):
         self.selected_delivery = None
         self.animations = []
         self.simulation_running = False
+        self.time_scale = 1
+        self.map_dirty = False
+        self.engine = SimulationEngine(drones, deliveries, no_fly_zones)
+        self.engine.subscribe('started', self.on_simulation_started)
+        self.engine.subscribe('delivery_assigned', self.on_delivery_assigned)
+        self.engine.subscribe('delivery_completed', self.on_delivery_completed)
+        self.engine.subscribe('delivery_failed', self.on_delivery_failed)
+        self.engine.subscribe('zone_changed', self.on_zone_changed)
+        self.engine.subscribe('error', self.on_simulation_error)
+        self.engine.subscribe('finished', self.on_simulation_finished)
+        self.ga_state = {}  # last GA population, reused to warm-start the next run
+        self.optimizer = None  # OptimizerThread while the GA runs in the background
+        self.last_plan = None  # (chromosome, deliveries, drones) last applied or cancelled
         self.simulation_timer = QTimer()
         self.simulation_timer.timeout.connect(self.simulation_step)
         
@@ -82,6 +99,56 @@ class DroneSimWindow(QMainWindow):
         show_stats_action.triggered.connect(self.show_statistics)
         view_menu.addAction(show_stats_action)
         
+        # Settings menu
+        settings_menu = menubar.addMenu('Settings')
+        
+        planner_menu = settings_menu.addMenu('Path Planner')
+        planner_group = QActionGroup(self)
+        for name, label in [('grid', 'Grid'), ('visibility', 'Visibility Graph'),
+                            ('raster', 'Occupancy Raster')]:
+            action = QAction(label, self, checkable=True)
+            action.setChecked(name == self.engine.planner)
+            action.triggered.connect(lambda checked, name=name: self.set_planner(name))
+            planner_group.addAction(action)
+            planner_menu.addAction(action)
+        
+        policy_menu = settings_menu.addMenu('Dispatch Policy')
+        policy_group = QActionGroup(self)
+        for name, label in [('greedy', 'Greedy'), ('nearest', 'Greedy, Nearest Drones'),
+                            ('assignment', 'Min-Cost Assignment')]:
+            action = QAction(label, self, checkable=True)
+            action.setChecked(name == 'greedy')
+            action.triggered.connect(lambda checked, name=name: self.set_policy(name))
+            policy_group.addAction(action)
+            policy_menu.addAction(action)
+        
+        speed_menu = settings_menu.addMenu('Time Scale')
+        speed_group = QActionGroup(self)
+        for label, scale in TIME_SCALES:
+            action = QAction(label, self, checkable=True)
+            action.setChecked(scale == self.time_scale)
+            action.triggered.connect(lambda checked, scale=scale: self.set_time_scale(scale))
+            speed_group.addAction(action)
+            speed_menu.addAction(action)
+        
+    def set_planner(self, planner):
+        """Select the path planner used by the simulation (see astar.PLANNERS)"""
+        self.engine.planner = planner
+        self.status_text.append(f"Path planner: {planner}")
+        
+    def set_policy(self, name):
+        """Select how idle drones are matched to deliveries (see dispatch.POLICIES)"""
+        self.engine.policy = make_policy(name)
+        self.status_text.append(f"Dispatch policy: {name}")
+        
+    def set_time_scale(self, scale):
+        """Multiple of BASE_PACE, or None to run as fast as possible"""
+        self.time_scale = scale
+        # Re-anchor so the clock continues from here at the new rate
+        self.sim_anchor = self.engine.current_time
+        self.wall_anchor = perf_counter()
+        self.status_text.append(f"Time scale: {'max' if scale is None else f'{scale}x'}")
+        
     def setup_ui(self):
         """Set up the main UI components"""
         main_widget = QWidget()
@@ -115,14 +182,18 @@ class DroneSimWindow(QMainWindow):
         self.start_btn = QPushButton("Start Simulation")
         self.reset_btn = QPushButton("Reset")
         self.optimize_btn = QPushButton("Optimize Routes")
+        self.apply_btn = QPushButton("Apply Best Plan")
+        self.apply_btn.setEnabled(False)
         
         self.start_btn.clicked.connect(self.start_simulation)
         self.reset_btn.clicked.connect(self.reset_simulation)
         self.optimize_btn.clicked.connect(self.optimize_routes)
+        self.apply_btn.clicked.connect(self.apply_best_plan)
         
         button_layout.addWidget(self.start_btn)
         button_layout.addWidget(self.reset_btn)
         button_layout.addWidget(self.optimize_btn)
+        button_layout.addWidget(self.apply_btn)
         map_layout.addLayout(button_layout)
         
         # Right panel (Tabs)
@@ -177,16 +248,16 @@ class DroneSimWindow(QMainWindow):
         if self.drawing_polygon:
             self.current_polygon_points.append((x, y))
             self.update_polygon_preview()
+        elif self.selected_delivery == "new":
+            self.selected_delivery = None
+            self.add_delivery((x, y))
         elif self.selected_delivery is None:
             # Check if clicked on a delivery point
-            for delivery in deliveries:
-                if not delivery['assigned']:
-                    dx = delivery['pos'][0] - x
-                    dy = delivery['pos'][1] - y
-                    if dx*dx + dy*dy < 1:  # Click radius
-                        self.selected_delivery = delivery
-                        self.status_text.append(f"Selected delivery {delivery['id']}")
-                        break
+            hit = self.engine.delivery_grid.nearest((x, y), 1, max_radius=1,  # Click radius
+                                                    where=lambda d: not d['assigned'])
+            if hit:
+                self.selected_delivery = hit[0]
+                self.status_text.append(f"Selected delivery {hit[0]['id']}")
     
     def on_map_motion(self, event):
         """Handle mouse motion for polygon drawing"""
@@ -228,7 +299,7 @@ class DroneSimWindow(QMainWindow):
         dialog = AddNoFlyZoneDialog(self.current_polygon_points, self)
         if dialog.exec_() == QDialog.Accepted:
             zone_data = dialog.get_zone_data()
-            no_fly_zones.append(zone_data)
+            self.engine.add_zone(zone_data)
             self.status_text.append(f"Added no-fly zone {zone_data['id']}")
             
         self.drawing_polygon = False
@@ -240,7 +311,7 @@ class DroneSimWindow(QMainWindow):
         dialog = AddDroneDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             drone_data = dialog.get_drone_data()
-            drones.append(drone_data)
+            self.engine.add_drone(drone_data)
             self.status_text.append(f"Added drone {drone_data['id']}")
             self.reset_simulation()
     
@@ -254,22 +325,99 @@ class DroneSimWindow(QMainWindow):
         dialog = AddDeliveryDialog(pos, self)
         if dialog.exec_() == QDialog.Accepted:
             delivery_data = dialog.get_delivery_data()
-            deliveries.append(delivery_data)
+            self.engine.add_delivery(delivery_data)
             self.status_text.append(f"Added delivery {delivery_data['id']}")
             self.reset_simulation()
     
     def optimize_routes(self):
-        """Run genetic algorithm to optimize routes"""
+        """Start the genetic algorithm in the background, or cancel a running one"""
+        if self.optimizer is not None:
+            self.optimizer.cancel()
+            self.optimize_btn.setEnabled(False)
+            self.status_text.append("Cancelling optimization...")
+            return
+        
         self.status_text.append("Optimizing routes...")
-        best_route, logbook = optimize_routes(drones, deliveries, no_fly_zones)
+        # A warm start only has to absorb the changes since the last run
+        n_gen = 15 if self.ga_state else 50
+        self.optimizer = OptimizerThread(drones, deliveries, no_fly_zones, n_gen=n_gen,
+                                         matrices=self.engine.matrices, state=self.ga_state,
+                                         patience=10, time_limit=30, parent=self)
+        self.ga_progress = ([], [], [])  # generation, best cost, average cost
+        self.convergence_pending = False
+        self.optimizer.progress.connect(self.on_optimizer_progress)
+        self.optimizer.completed.connect(self.on_optimizer_completed)
+        self.optimizer.failed.connect(self.on_optimizer_failed)
+        self.optimizer.finished.connect(self.on_optimizer_finished)
+        self.optimize_btn.setText("Cancel Optimization")
+        self.optimizer.start()
+    
+    def on_optimizer_progress(self, gen, best, avg):
+        """Stream the GA's fitness to the statistics tab"""
+        for values, value in zip(self.ga_progress, (gen, best, avg)):
+            values.append(value)
+        self.apply_btn.setEnabled(True)
+        # Redrawing per generation would starve the event loop; batch them
+        if not self.convergence_pending:
+            self.convergence_pending = True
+            QTimer.singleShot(200, self.draw_convergence)
+    
+    def draw_convergence(self):
+        self.convergence_pending = False
+        self.stats_ax = plot_convergence(self.stats_ax, *self.ga_progress)
+        self.stats_canvas.draw_idle()
+    
+    def on_optimizer_completed(self, best_plan, logbook):
+        plan = (best_plan, self.optimizer.deliveries, self.optimizer.drones)
+        if self.optimizer.cancelled:
+            # Keep it for the Apply button rather than applying a plan the user stopped
+            self.last_plan = plan
+            self.status_text.append(f"Route optimization cancelled after {len(logbook) - 1} "
+                                    f"generations; use Apply Best Plan to apply its best plan")
+            return
+        self.status_text.append(f"Route optimization finished after {len(logbook) - 1} generations")
+        self.apply_plan(*plan)
+    
+    def on_optimizer_failed(self, message):
+        self.status_text.append(f"Route optimization failed: {message}")
+    
+    def on_optimizer_finished(self):
+        self.optimizer.deleteLater()
+        self.optimizer = None
+        self.optimize_btn.setText("Optimize Routes")
+        self.optimize_btn.setEnabled(True)
+    
+    def apply_best_plan(self):
+        """Apply the best plan found so far, even while the GA is still running"""
+        if self.optimizer is not None and self.optimizer.best is not None:
+            self.apply_plan(self.optimizer.best, self.optimizer.deliveries, self.optimizer.drones)
+        elif self.last_plan is not None:
+            self.apply_plan(*self.last_plan)
+    
+    def apply_plan(self, best_plan, plan_deliveries, plan_drones):
+        """Route the simulation along a chromosome planned for these lists"""
+        # The thread planned on a snapshot; drones are only ever appended, so rows still match
+        self.last_plan = (best_plan, plan_deliveries, plan_drones)
+        routes = decode_routes(best_plan, len(plan_deliveries))
         
-        # Update delivery order based on optimization
-        optimized_deliveries = [deliveries[i] for i in best_route]
-        deliveries.clear()
-        deliveries.extend(optimized_deliveries)
+        # Remember which drone each delivery was planned for
+        self.engine.planned_drone = {
+            id(plan_deliveries[i]): k for k, route in enumerate(routes) for i in route
+        }
         
-        self.status_text.append("Route optimization complete")
         self.reset_simulation()
+        for drone, route in zip(plan_drones, routes):
+            self.status_text.append(
+                f"Drone {drone['id']}: " + " -> ".join(str(plan_deliveries[i]['id']) for i in route)
+            )
+        self.status_text.append(f"Applied route plan (cost {best_plan.fitness.values[0]:.1f})")
+    
+    def closeEvent(self, event):
+        """Stop a running optimization before the window goes away"""
+        if self.optimizer is not None:
+            self.optimizer.cancel()
+            self.optimizer.wait()
+        super().closeEvent(event)
     
     def show_statistics(self):
         """Show statistics in the statistics tab"""
@@ -326,16 +474,8 @@ class DroneSimWindow(QMainWindow):
                 anim.event_source.stop()
             self.animations.clear()
             
-            # Reset drone states
-            for drone in drones:
-                drone['current_pos'] = drone['start_pos']
-                drone['battery_left'] = drone['battery']
-                drone['assigned_delivery'] = None
-            
-            # Reset delivery states
-            for delivery in deliveries:
-                delivery['assigned'] = False
-                delivery['drone_id'] = None
+            # Reset drone and delivery states
+            self.engine.reset()
             
             # Update display
             plot_map(self.ax, drones, deliveries, no_fly_zones)
@@ -353,22 +493,17 @@ class DroneSimWindow(QMainWindow):
             self.status_text.clear()
             self.simulation_running = True
             
-            # Initialize simulation state
-            self.current_time = 0
-            self.pending_deliveries = deliveries.copy()
-            self.active_drones = [drone.copy() for drone in drones]
-            self.completed_deliveries = []
-            self.failed_deliveries = []
-            
             # Reset any existing animations
             for anim in self.animations:
                 anim.event_source.stop()
             self.animations.clear()
             
-            self.status_text.append(f"Starting simulation at time {self.current_time}")
+            self.engine.start()
+            self.sim_anchor = self.engine.current_time
+            self.wall_anchor = perf_counter()
             
-            # Start simulation timer (update every 500ms)
-            self.simulation_timer.start(500)
+            # The timer is the frame clock; the engine catches up on every tick
+            self.simulation_timer.start(1000 // FRAME_RATE)
             
         except Exception as e:
             self.status_text.append(f"Error starting simulation: {str(e)}")
@@ -376,95 +511,29 @@ class DroneSimWindow(QMainWindow):
             self.simulation_running = False
     
     def simulation_step(self):
-        """Execute one step of the simulation"""
+        """Advance the simulation to the current frame and redraw the map"""
         try:
-            if not self.simulation_running or self.current_time > 120:
-                self.simulation_timer.stop()
-                self.finish_simulation()
-                return
+            if self.simulation_running:
+                if self.time_scale is None:
+                    # Step for one frame's worth of wall time, then let Qt paint
+                    deadline = perf_counter() + 1 / FRAME_RATE
+                    while perf_counter() < deadline and self.engine.step():
+                        pass
+                else:
+                    self.engine.advance(self.sim_anchor +
+                                        (perf_counter() - self.wall_anchor) * BASE_PACE * self.time_scale)
+                self.simulation_running = self.engine.running
             
-            # Get available deliveries and drones
-            available_deliveries = get_available_deliveries(self.pending_deliveries, self.current_time)
-            available_drones = get_available_drones(self.active_drones, self.current_time)
-            
-            if not available_deliveries and not self.pending_deliveries:
+            # Only the latest state is drawn; events since the last frame are not replayed
+            if self.map_dirty:
+                self.map_dirty = False
+                self.update_drones_table()
+                plot_map(self.ax, self.engine.active_drones,
+                         list(self.engine.pending_deliveries.values()),
+                         no_fly_zones, self.engine.current_time)
+                self.canvas.draw_idle()
+            if not self.simulation_running:
                 self.simulation_timer.stop()
-                self.finish_simulation()
-                return
-            
-            # Sort deliveries by priority score
-            available_deliveries = sort_deliveries_by_priority(available_deliveries, self.current_time)
-            
-            # Try to assign deliveries
-            for delivery in available_deliveries[:]:
-                assigned = False
-                
-                # Find best drone for this delivery
-                for drone in available_drones:
-                    try:
-                        # Basic checks
-                        if delivery['weight'] > drone['max_weight']:
-                            continue
-                        
-                        # Calculate path
-                        path = astar(drone['current_pos'], delivery['pos'], 
-                                    no_fly_zones, delivery['weight'])
-                        if not path:
-                            continue
-                            
-                        # Calculate energy needed
-                        energy_needed = calculate_energy(path, drone, delivery['weight'])
-                        if energy_needed > drone['battery_left']:
-                            continue
-                        
-                        # Assign delivery
-                        drone['battery_left'] -= energy_needed
-                        drone['assigned_delivery'] = delivery
-                        delivery['assigned'] = True
-                        delivery['drone_id'] = drone['id']
-                        
-                        # Animate the delivery
-                        anim = animate_drone_path(
-                            self.ax, drone, path, delivery, no_fly_zones
-                        )
-                        if anim:
-                            self.animations.append(anim)
-                        
-                        # Update drone position
-                        drone['current_pos'] = delivery['pos']
-                        self.pending_deliveries.remove(delivery)
-                        self.completed_deliveries.append(delivery)
-                        assigned = True
-                        
-                        # Update display
-                        self.status_text.append(
-                            f"Time {self.current_time}: Drone {drone['id']} delivering package {delivery['id']}"
-                            f" (Priority: {delivery['priority']}, Battery left: {drone['battery_left']:.0f})"
-                        )
-                        
-                        # Update tables and plots
-                        self.update_drones_table()
-                        plot_map(self.ax, self.active_drones, self.pending_deliveries, 
-                                no_fly_zones, self.current_time)
-                        self.canvas.draw()
-                        QApplication.processEvents()
-                        break
-                        
-                    except Exception as e:
-                        self.status_text.append(f"Error processing delivery: {str(e)}")
-                        continue
-                
-                if not assigned:
-                    # Check if delivery will expire
-                    if self.current_time >= delivery['time_window'][1]:
-                        self.pending_deliveries.remove(delivery)
-                        self.failed_deliveries.append(delivery)
-                        self.status_text.append(
-                            f"Time {self.current_time}: Delivery {delivery['id']} failed - Time window expired"
-                        )
-            
-            # Advance time
-            self.current_time += 5  # 5-minute intervals
             
         except Exception as e:
             self.status_text.append(f"Error in simulation step: {str(e)}")
@@ -472,24 +541,74 @@ class DroneSimWindow(QMainWindow):
             self.simulation_timer.stop()
             self.simulation_running = False
     
-    def finish_simulation(self):
+    def on_simulation_started(self, event):
+        self.status_text.append(f"Starting simulation at time {event['time']}")
+    
+    def on_delivery_assigned(self, event):
+        """Animate an assignment and mark the map for a redraw"""
+        drone, delivery = event['drone'], event['delivery']
+        # Animations play in real time and would fall behind a faster clock
+        if self.time_scale == 1:
+            anim = animate_drone_path(self.ax, drone, event['path'], delivery, no_fly_zones)
+            if anim:
+                self.animations.append(anim)
+        
+        self.status_text.append(
+            f"Time {event['time']:.1f}: Drone {drone['id']} delivering package {delivery['id']}"
+            f" (Priority: {delivery['priority']}, Battery left: {drone['battery_left']:.0f},"
+            f" arriving at {event['arrival']:.1f})"
+        )
+        self.map_dirty = True
+    
+    def on_delivery_completed(self, event):
+        self.status_text.append(
+            f"Time {event['time']:.1f}: Drone {event['drone']['id']} delivered package "
+            f"{event['delivery']['id']}"
+        )
+        self.map_dirty = True
+    
+    def on_zone_changed(self, event):
+        state = "active" if event['active'] else "inactive"
+        self.status_text.append(f"Time {event['time']:.1f}: No-fly zone {event['zone']['id']} {state}")
+        self.map_dirty = True
+    
+    def on_delivery_failed(self, event):
+        self.status_text.append(
+            f"Time {event['time']:.1f}: Delivery {event['delivery']['id']} failed - {event['reason']}"
+        )
+        self.map_dirty = True
+    
+    def on_simulation_error(self, event):
+        self.status_text.append(event['message'])
+    
+    def on_simulation_finished(self, event):
         """Finish the simulation and show final results"""
         try:
-            self.simulation_running = False
+            results = event['results']
             
             # Final report
             self.status_text.append("\n=== Final Results ===")
-            self.status_text.append(f"Total deliveries: {len(deliveries)}")
-            self.status_text.append(f"Completed: {len(self.completed_deliveries)}")
-            self.status_text.append(f"Failed: {len(self.failed_deliveries)}")
+            self.status_text.append(f"Total deliveries: {results['total']}")
+            self.status_text.append(f"Completed: {results['completed']}")
+            self.status_text.append(f"Failed: {results['failed']}")
+            cache_stats = results['path_cache']
+            self.status_text.append(
+                f"Path cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%} hit rate)"
+            )
+            prefilter = results['prefilter']
+            self.status_text.append(
+                f"Prefilter: {prefilter['rejected']} of {prefilter['pairs']} pairs rejected, "
+                f"{prefilter['searches_saved']} path searches saved"
+            )
             
             # Show statistics
             self.show_statistics()
             
             # List failed deliveries
-            if self.failed_deliveries:
+            if self.engine.failed_deliveries:
                 self.status_text.append("\nFailed Deliveries:")
-                for delivery in self.failed_deliveries:
+                for delivery in self.engine.failed_deliveries:
                     self.status_text.append(
                         f"ID: {delivery['id']}, Priority: {delivery['priority']}, "
                         f"Weight: {delivery['weight']}"
@@ -1,73 +1,538 @@
 import random
+import time
+import multiprocessing
+import queue
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from deap import base, creator, tools, algorithms
-from astar import astar
-from utils import calculate_energy, calculate_distance
+from matrices import DistanceMatrices
+
+# Penalty weights for constraint violations in the route cost
+CAPACITY_PENALTY = 1000     # per kg above a drone's max weight
+BATTERY_PENALTY = 1         # per unit of energy above a drone's battery
+TIME_WINDOW_PENALTY = 10    # per minute late, times the delivery priority
+
+def build_problem(drones, deliveries, matrices=None):
+    """Collect the read-only arrays the fitness function needs"""
+    if matrices is None:
+        matrices = DistanceMatrices(drones, deliveries)
+    return {
+        'n_deliveries': len(deliveries),
+        'n_drones': len(drones),
+        'delivery_dist': matrices.delivery_dist,
+        'drone_dist': matrices.drone_dist,
+        'energy_rate': matrices.energy_rate,
+        'weight': np.array([d['weight'] for d in deliveries], dtype=float),
+        'priority': np.array([d['priority'] for d in deliveries], dtype=float),
+        'window_start': np.array([d['time_window'][0] for d in deliveries], dtype=float),
+        'window_end': np.array([d['time_window'][1] for d in deliveries], dtype=float),
+        'max_weight': np.array([d['max_weight'] for d in drones], dtype=float),
+        'battery': np.array([d['battery'] for d in drones], dtype=float),
+        'speed': np.array([d['speed'] for d in drones], dtype=float),
+    }
+
+def decode_routes(individual, n_deliveries):
+    """Split a chromosome into one delivery-index list per drone.
+
+    A chromosome is a permutation of range(n_deliveries + n_drones - 1).
+    Values below n_deliveries are deliveries; the others are split points
+    that end the current drone's route and start the next one's.
+    """
+    routes = [[]]
+    for gene in individual:
+        if gene >= n_deliveries:
+            routes.append([])
+        else:
+            routes[-1].append(gene)
+    return routes
+
+def evaluate_population(problem, individuals):
+    """Route cost of every individual, computed column by column in NumPy.
+
+    Each drone flies its route from its start position. The cost is the
+    total distance plus penalties for overweight packages, battery
+    overruns and late arrivals (drones wait for early time windows).
+    """
+    n = problem['n_deliveries']
+    genes = np.asarray(individuals, dtype=int).reshape(len(individuals), -1)
+    if n == 0:
+        # Only split points: every route is empty and costs nothing
+        return np.zeros(len(genes))
+
+    drone = np.zeros(len(genes), dtype=int)
+    last = np.zeros(len(genes), dtype=int)
+    at_start = np.ones(len(genes), dtype=bool)
+    clock = np.zeros(len(genes))
+    energy = np.zeros(len(genes))
+    distance = np.zeros(len(genes))
+    overweight = np.zeros(len(genes))
+    overrun = np.zeros(len(genes))
+    lateness = np.zeros(len(genes))
+
+    for column in genes.T:
+        split = column >= n
+        d = np.where(split, 0, column)
+        leg = np.where(at_start, problem['drone_dist'][drone, d],
+                       problem['delivery_dist'][last, d])
+        leg = np.where(split, 0, leg)
+        distance += leg
+        energy += leg * problem['energy_rate'][drone, d]
+        arrival = np.maximum(clock + leg / problem['speed'][drone],
+                             problem['window_start'][d])
+        clock = np.where(split, 0, arrival)
+        lateness += np.where(split, 0, np.maximum(arrival - problem['window_end'][d], 0)
+                             * problem['priority'][d])
+        overweight += np.where(split, 0, np.maximum(problem['weight'][d]
+                                                     - problem['max_weight'][drone], 0))
+
+        # A split point closes the current drone's route
+        overrun += np.where(split, np.maximum(energy - problem['battery'][drone], 0), 0)
+        energy = np.where(split, 0, energy)
+        drone = drone + split
+        last = np.where(split, last, d)
+        at_start = split
+    overrun += np.maximum(energy - problem['battery'][drone], 0)
+
+    return (distance
+            + CAPACITY_PENALTY * overweight
+            + BATTERY_PENALTY * overrun
+            + TIME_WINDOW_PENALTY * lateness)
+
+class FitnessCache:
+    """Bounded LRU map from canonical chromosome to its fitness.
+
+    Split tokens are interchangeable, so chromosomes that differ only in
+    which split token sits where decode to the same plan and share a key.
+    """
+
+    def __init__(self, n_deliveries, capacity=10000):
+        self.n_deliveries = n_deliveries
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._window = (0, 0)  # hits, misses at the last generation_hit_rate()
+
+    def key(self, individual):
+        n = self.n_deliveries
+        return tuple(gene if gene < n else n for gene in individual)
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def generation_hit_rate(self):
+        """Hit rate of the lookups made since the previous call"""
+        hits = self.hits - self._window[0]
+        misses = self.misses - self._window[1]
+        self._window = (self.hits, self.misses)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+# Problem arrays of a pool worker, set once by _init_worker
+_worker_problem = None
+
+def _init_worker(problem):
+    global _worker_problem
+    _worker_problem = problem
+
+def _evaluate_chunk(genes):
+    return evaluate_population(_worker_problem, genes).tolist()
+
+def create_route_optimizer(drones, deliveries, no_fly_zones, matrices=None,
+                           executor=None, workers=1, problem=None, cache_size=10000):
+    """Create a genetic algorithm optimizer for drone routes.
+
+    With an `executor` whose `workers` processes were started by
+    `_init_worker`, each batch of evaluations is split into one chunk per
+    worker. Only the chromosomes travel to the workers; the problem arrays
+    are already there. Fitnesses are memoized in `toolbox.fitness_cache`
+    unless `cache_size` is 0.
+    """
+    if not drones:
+        raise ValueError("Route optimization needs at least one drone")
+    if problem is None:
+        problem = build_problem(drones, deliveries, matrices)
+    return create_problem_toolbox(problem, executor, workers, cache_size)
+
+def create_creator_classes():
+    """Create the DEAP fitness and individual classes once per process"""
+    if not hasattr(creator, "FitnessMin"):
+        creator.create("FitnessMin", base.Fitness, weights=(-1.0,))  # Minimize route cost
+    if not hasattr(creator, "Individual"):
+        creator.create("Individual", list, fitness=creator.FitnessMin)
+
+def create_problem_toolbox(problem, executor=None, workers=1, cache_size=10000):
+    """The toolbox of `create_route_optimizer`, built from `build_problem` arrays"""
+    size = problem['n_deliveries'] + problem['n_drones'] - 1
 
-def create_route_optimizer(drones, deliveries, no_fly_zones):
-    """Create a genetic algorithm optimizer for drone routes"""
-    
     # Create fitness and individual classes
-    creator.create("FitnessMin", base.Fitness, weights=(-1.0,))  # Minimize total distance
-    creator.create("Individual", list, fitness=creator.FitnessMin)
-    
+    create_creator_classes()
+
     toolbox = base.Toolbox()
-    
-    # Attribute generator
-    toolbox.register("attr_delivery", random.randint, 0, len(deliveries) - 1)
-    
-    # Structure initializers
-    toolbox.register("individual", tools.initRepeat, creator.Individual, 
-                     toolbox.attr_delivery, n=len(deliveries))
+
+    # Structure initializers: a random permutation of deliveries and split points
+    toolbox.register("indices", random.sample, range(size), size)
+    toolbox.register("individual", tools.initIterate, creator.Individual,
+                     toolbox.indices)
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-    
+
     def evaluate_route(individual):
-        """Evaluate a delivery route"""
-        total_distance = 0
-        total_energy = 0
-        
-        # Calculate path distances
-        for i in range(len(individual) - 1):
-            p1 = individual[i]['pos']
-            p2 = individual[i + 1]['pos']
-            total_distance += calculate_distance(p1, p2)
-        
-        # Add return to start position if needed
-        if individual:
-            total_distance += calculate_distance(individual[-1]['pos'], individual[0]['pos'])
-        
-        # Calculate fitness score
-        fitness = (
-            total_distance * -1.0 +  # Minimize distance
-            sum(d['priority'] * 100 for d in individual)  # Maximize priority deliveries
-        )
-        
-        return (fitness,)  # Return as tuple for DEAP
-    
+        """Evaluate a single fleet plan"""
+        return (float(evaluate_population(problem, [individual])[0]),)  # Return as tuple for DEAP
+
+    def score(individuals):
+        """Costs of a batch: one vectorized pass, or one per pool worker"""
+        if executor is None:
+            return evaluate_population(problem, individuals)
+        genes = [list(ind) for ind in individuals]
+        n_chunks = min(workers, len(genes))
+        chunks = [genes[i::n_chunks] for i in range(n_chunks)]
+        results = list(executor.map(_evaluate_chunk, chunks))
+        # Undo the round-robin split
+        costs = [0.0] * len(genes)
+        for i, chunk_costs in enumerate(results):
+            costs[i::n_chunks] = chunk_costs
+        return costs
+
+    def evaluate_map(func, individuals):
+        """Score a whole batch at once when eaSimple maps evaluate"""
+        individuals = list(individuals)
+        if func is not toolbox.evaluate or not individuals:
+            return map(func, individuals)
+        if cache is None:
+            return [(float(cost),) for cost in score(individuals)]
+
+        keys = [cache.key(ind) for ind in individuals]
+        fitnesses = [cache.get(key) for key in keys]
+        # Duplicates within the batch are scored once
+        missing = {}
+        for key, ind, fitness in zip(keys, individuals, fitnesses):
+            if fitness is None and key not in missing:
+                missing[key] = ind
+        computed = {}
+        if missing:
+            for key, cost in zip(missing, score(list(missing.values()))):
+                computed[key] = (float(cost),)
+                cache.put(key, computed[key])
+        return [fitness or computed[key] for key, fitness in zip(keys, fitnesses)]
+
+    cache = FitnessCache(problem['n_deliveries'], cache_size) if cache_size else None
+    toolbox.fitness_cache = cache
     toolbox.register("evaluate", evaluate_route)
+    toolbox.register("map", evaluate_map)
     toolbox.register("mate", tools.cxOrdered)
     toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.1)
     toolbox.register("select", tools.selTournament, tournsize=3)
-    
+
     return toolbox
 
-def optimize_routes(drones, deliveries, no_fly_zones, pop_size=100, n_gen=50):
-    """Run the genetic algorithm to optimize delivery routes"""
-    toolbox = create_route_optimizer(drones, deliveries, no_fly_zones)
-    
-    # Create initial population
-    pop = toolbox.population(n=pop_size)
-    
-    # Track best solution
-    hof = tools.HallOfFame(1)
-    
-    # Run algorithm
+def optimize_routes(drones, deliveries, no_fly_zones, pop_size=100, n_gen=50, matrices=None,
+                    workers=1, cache_size=10000, state=None, verbose=True, problem=None,
+                    callback=None, patience=None, time_limit=None):
+    """Run the genetic algorithm to optimize delivery routes.
+
+    Returns the best chromosome, which `decode_routes` turns into one
+    delivery list per drone, and the DEAP logbook. With `workers` > 1 the
+    fitness evaluations run in a process pool of that size. Up to
+    `cache_size` fitnesses are memoized; the logbook's 'hit_rate' column
+    gives each generation's cache hit rate.
+
+    `state` is an optional dict that carries a run over to the next one.
+    After a run it holds the final population and the drones and
+    deliveries it was evolved for. When it already holds a population,
+    that population is repaired for the current drones and deliveries and
+    seeds this run, so a small change needs only a few generations.
+
+    `callback`, `patience` and `time_limit` are passed on to `run_ga` for
+    progress reporting, cancellation and early stopping. A prebuilt
+    `problem` skips `build_problem`.
+    """
+    if problem is None:
+        problem = build_problem(drones, deliveries, matrices)
+    stopping = dict(callback=callback, patience=patience, time_limit=time_limit)
+    seeds = None
+    if state and state.get('population'):
+        seeds = repair_population(state, drones, deliveries, problem)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(problem,)) as executor:
+            best, logbook, pop = run_ga(
+                create_route_optimizer(drones, deliveries, no_fly_zones, executor=executor,
+                                       workers=workers, problem=problem, cache_size=cache_size),
+                pop_size, n_gen, seeds, verbose, **stopping)
+    else:
+        best, logbook, pop = run_ga(
+            create_route_optimizer(drones, deliveries, no_fly_zones, problem=problem,
+                                   cache_size=cache_size),
+            pop_size, n_gen, seeds, verbose, **stopping)
+
+    if state is not None:
+        state['drones'] = list(drones)
+        state['deliveries'] = list(deliveries)
+        # Best first, so it survives the repair even if eaSimple lost it
+        state['population'] = [list(best)] + [list(ind) for ind in pop]
+    return best, logbook
+
+def repair_population(state, drones, deliveries, problem):
+    """Map a stored population onto the current drones and deliveries.
+
+    Drones and deliveries are matched by identity. Removed deliveries are
+    dropped, routes of removed drones are released, and every delivery
+    without a route is inserted where it adds the least distance.
+    """
+    n = len(deliveries)
+    new_delivery = {id(d): i for i, d in enumerate(deliveries)}
+    new_drone = {id(d): k for k, d in enumerate(drones)}
+    old_deliveries = state['deliveries']
+    old_drones = state['drones']
+
+    seeds = []
+    for genes in state['population']:
+        routes = [[] for _ in drones]
+        placed = set()
+        for k_old, route in enumerate(decode_routes(genes, len(old_deliveries))):
+            k = new_drone.get(id(old_drones[k_old])) if k_old < len(old_drones) else None
+            if k is None:
+                continue
+            for i_old in route:
+                i = new_delivery.get(id(old_deliveries[i_old]))
+                if i is not None:
+                    routes[k].append(i)
+                    placed.add(i)
+        for i in range(n):
+            if i not in placed:
+                insert_cheapest(routes, i, problem)
+        seeds.append(encode_routes(routes, n))
+    return seeds
+
+def insert_cheapest(routes, i, problem):
+    """Insert delivery i where it lengthens the fleet's routes the least"""
+    best = None
+    for k, route in enumerate(routes):
+        for pos in range(len(route) + 1):
+            if pos == 0:
+                before = problem['drone_dist'][k, i]
+                removed = problem['drone_dist'][k, route[0]] if route else 0
+            else:
+                before = problem['delivery_dist'][route[pos - 1], i]
+                removed = problem['delivery_dist'][route[pos - 1], route[pos]] if pos < len(route) else 0
+            after = problem['delivery_dist'][i, route[pos]] if pos < len(route) else 0
+            added = before + after - removed
+            if best is None or added < best[0]:
+                best = (added, k, pos)
+    routes[best[1]].insert(best[2], i)
+
+def encode_routes(routes, n_deliveries):
+    """Inverse of `decode_routes`"""
+    genes = []
+    for k, route in enumerate(routes):
+        if k:
+            genes.append(n_deliveries + k - 1)
+        genes.extend(route)
+    return genes
+
+def make_stats(toolbox):
+    """Logbook statistics: fitness avg/min and the fitness-cache hit rate"""
     stats = tools.Statistics(lambda ind: ind.fitness.values)
     stats.register("avg", np.mean)
     stats.register("min", np.min)
-    
-    pop, logbook = algorithms.eaSimple(pop, toolbox, cxpb=0.7, mutpb=0.2, 
-                                      ngen=n_gen, stats=stats, halloffame=hof,
-                                      verbose=True)
-    
-    return hof[0], logbook
\ No newline at end of file
+    if getattr(toolbox, "fitness_cache", None) is not None:
+        stats.register("hit_rate", lambda fits: toolbox.fitness_cache.generation_hit_rate())
+    return stats
+
+def run_ga(toolbox, pop_size, n_gen, seeds=None, verbose=True, callback=None,
+           patience=None, time_limit=None):
+    """Evolve a population like eaSimple; returns (best, logbook, population).
+
+    The population starts from up to `pop_size` of the `seeds` chromosomes
+    and is topped up with random individuals.
+
+    After every generation `callback(gen, best, record)` is called with the
+    best individual so far and the logbook record; returning True stops
+    the run. It also stops once the best cost has not improved for
+    `patience` generations or after `time_limit` seconds.
+    """
+    started = time.perf_counter()
+
+    # Create initial population
+    pop = [creator.Individual(genes) for genes in (seeds or [])[:pop_size]]
+    pop += toolbox.population(n=pop_size - len(pop))
+
+    # Track best solution
+    hof = tools.HallOfFame(1)
+    stats = make_stats(toolbox)
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + stats.fields
+
+    nevals = evaluate_invalid(toolbox, pop)
+    hof.update(pop)
+    best_cost = hof[0].fitness.values[0]
+    stale = 0
+
+    for gen in range(n_gen + 1):
+        if gen > 0:
+            offspring = algorithms.varAnd(toolbox.select(pop, len(pop)), toolbox, cxpb=0.7, mutpb=0.2)
+            nevals = evaluate_invalid(toolbox, offspring)
+            hof.update(offspring)
+            pop[:] = offspring
+
+        record = stats.compile(pop)
+        logbook.record(gen=gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
+
+        if hof[0].fitness.values[0] < best_cost:
+            best_cost = hof[0].fitness.values[0]
+            stale = 0
+        elif gen > 0:
+            stale += 1
+
+        if callback is not None and callback(gen, hof[0], record):
+            break
+        if patience is not None and stale >= patience:
+            break
+        if time_limit is not None and time.perf_counter() - started >= time_limit:
+            break
+
+    return hof[0], logbook, pop
+
+def evaluate_invalid(toolbox, individuals):
+    """Evaluate the individuals without a valid fitness; returns how many"""
+    invalid = [ind for ind in individuals if not ind.fitness.valid]
+    for ind, fit in zip(invalid, toolbox.map(toolbox.evaluate, invalid)):
+        ind.fitness.values = fit
+    return len(invalid)
+
+def _run_island(island, problem, n_islands, inboxes, results, pop_size, n_gen,
+                migration_interval, migration_size, topology, hof_size, seed):
+    """One island of `optimize_routes_islands`, run in its own process"""
+    random.seed(None if seed is None else seed + island)
+    toolbox = create_problem_toolbox(problem)
+    pop = toolbox.population(n=pop_size)
+    hof = tools.HallOfFame(hof_size)
+    stats = make_stats(toolbox)
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + stats.fields
+
+    nevals = evaluate_invalid(toolbox, pop)
+    hof.update(pop)
+    logbook.record(gen=0, nevals=nevals, **stats.compile(pop))
+
+    for gen in range(1, n_gen + 1):
+        offspring = algorithms.varAnd(toolbox.select(pop, len(pop)), toolbox, cxpb=0.7, mutpb=0.2)
+        nevals = evaluate_invalid(toolbox, offspring)
+        hof.update(offspring)
+        pop[:] = offspring
+
+        if n_islands > 1 and gen % migration_interval == 0 and gen < n_gen:
+            # Send copies of our best, replace our worst with whatever arrives
+            elites = [(list(ind), ind.fitness.values) for ind in tools.selBest(pop, migration_size)]
+            if topology == "ring":
+                inboxes[(island + 1) % n_islands].put(elites)
+                migrants = inboxes[island].get()
+            else:
+                target = random.choice([i for i in range(n_islands) if i != island])
+                inboxes[target].put(elites)
+                migrants = []
+                while True:
+                    try:
+                        migrants.extend(inboxes[island].get_nowait())
+                    except queue.Empty:
+                        break
+            pop.sort(key=lambda ind: ind.fitness, reverse=True)
+            for i, (genes, values) in enumerate(migrants[:len(pop)]):
+                ind = creator.Individual(genes)
+                ind.fitness.values = values
+                pop[-(i + 1)] = ind
+
+        logbook.record(gen=gen, nevals=nevals, **stats.compile(pop))
+
+    # Migrants nobody reads any more must not hold up this process's exit
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+    results.put((island, [(list(ind), ind.fitness.values) for ind in hof], logbook))
+
+def optimize_routes_islands(drones, deliveries, no_fly_zones, n_islands=4, pop_size=100,
+                            n_gen=50, migration_interval=10, migration_size=5,
+                            topology="ring", hof_size=5, matrices=None, seed=None):
+    """Island-model variant of `optimize_routes`.
+
+    Runs `n_islands` populations of `pop_size` in separate processes. Every
+    `migration_interval` generations each island sends copies of its
+    `migration_size` best individuals to its successor ("ring") or to a
+    random other island ("random"). Those replace the receiver's worst
+    individuals. Ring migration is synchronous: each island waits for its
+    predecessor's elites. Random migration is asynchronous: an island
+    takes whatever has arrived by then, so runs with the same `seed` can
+    differ. Returns the best chromosome of the merged halls of fame and
+    the list of per-island logbooks. Raises RuntimeError if an island
+    process dies.
+    """
+    if topology not in ("ring", "random"):
+        raise ValueError(f"Unknown migration topology: {topology}")
+    if not drones:
+        raise ValueError("Route optimization needs at least one drone")
+    problem = build_problem(drones, deliveries, matrices)
+    inboxes = [multiprocessing.Queue() for _ in range(n_islands)]
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_run_island, args=(
+            island, problem, n_islands, inboxes, results, pop_size, n_gen,
+            migration_interval, migration_size, topology, hof_size, seed))
+        for island in range(n_islands)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = []
+    try:
+        while len(outcomes) < n_islands:
+            try:
+                outcomes.append(results.get(timeout=0.5))
+            except queue.Empty:
+                dead = [i for i, process in enumerate(processes) if process.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Island {dead[0]} died with exit code "
+                                       f"{processes[dead[0]].exitcode}")
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        # Drop unread random-topology migrants
+        for inbox in inboxes:
+            try:
+                while True:
+                    inbox.get_nowait()
+            except queue.Empty:
+                pass
+        for process in processes:
+            process.join()
+    outcomes.sort(key=lambda outcome: outcome[0])
+
+    create_creator_classes()
+    hof = tools.HallOfFame(hof_size)
+    for _, members, _ in outcomes:
+        individuals = []
+        for genes, values in members:
+            ind = creator.Individual(genes)
+            ind.fitness.values = values
+            individuals.append(ind)
+        hof.update(individuals)
+    return hof[0], [logbook for _, _, logbook in outcomes]
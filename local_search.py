@@ -0,0 +1,327 @@
+import math
+import random
+import time
+import numpy as np
+
+from genetic_algorithm import (
+    CAPACITY_PENALTY, BATTERY_PENALTY, TIME_WINDOW_PENALTY, build_problem, decode_routes,
+    encode_routes, evaluate_population, insert_cheapest, optimize_routes
+)
+
+class RouteState:
+    """Fleet routes with per-route prefix sums for constant-time move deltas.
+
+    Each route is stored as [start node, delivery, delivery, ...], where
+    drone k's start node is n_deliveries + k. The cost is the one that
+    `evaluate_population` uses. The `*_delta` methods price distance,
+    overweight and battery overrun in constant time. Energy depends on
+    the destination of each leg, so reversing a segment is priced with a
+    second prefix sum that charges each leg at its source's rate.
+    Lateness cascades along a route, so it is kept per route and only
+    recomputed for moves the constant-time part cannot rule out.
+    """
+
+    def __init__(self, problem, routes):
+        self.n = problem['n_deliveries']
+        self.dist = np.vstack([problem['delivery_dist'], problem['drone_dist']]).tolist()
+        self.rate = problem['energy_rate'].tolist()
+        self.weight = problem['weight'].tolist()
+        self.max_weight = problem['max_weight'].tolist()
+        self.battery = problem['battery'].tolist()
+        self.speed = problem['speed'].tolist()
+        self.window_start = problem['window_start'].tolist()
+        self.window_end = problem['window_end'].tolist()
+        self.priority = problem['priority'].tolist()
+        self.routes = [[self.n + k] + list(route) for k, route in enumerate(routes)]
+        self.length = [0.0] * len(self.routes)
+        self.energy = [0.0] * len(self.routes)
+        self.overweight = [0.0] * len(self.routes)
+        self.lateness = [0.0] * len(self.routes)
+        self.forward = [None] * len(self.routes)
+        self.backward = [None] * len(self.routes)
+        for k in range(len(self.routes)):
+            self.rebuild(k)
+        self.cost = sum(self.route_cost(k) for k in range(len(self.routes)))
+
+    def rebuild(self, k):
+        """Recompute route k's totals and prefix sums after it changed"""
+        route, dist, rate = self.routes[k], self.dist, self.rate[k]
+        forward = [0.0]
+        backward = [0.0]
+        length = 0.0
+        for t in range(1, len(route)):
+            d = dist[route[t - 1]][route[t]]
+            length += d
+            forward.append(forward[-1] + d * rate[route[t]])
+            backward.append(backward[-1] + (d * rate[route[t - 1]] if t > 1 else 0.0))
+        self.length[k] = length
+        self.energy[k] = forward[-1]
+        self.forward[k] = forward
+        self.backward[k] = backward
+        self.overweight[k] = sum(self.over(x, k) for x in route[1:])
+        self.lateness[k] = self.route_lateness(k, route)
+
+    def route_lateness(self, k, route):
+        """Priority-weighted minutes late along `route` flown by drone k"""
+        clock = 0.0
+        late = 0.0
+        for t in range(1, len(route)):
+            x = route[t]
+            clock = max(clock + self.dist[route[t - 1]][x] / self.speed[k], self.window_start[x])
+            late += max(clock - self.window_end[x], 0.0) * self.priority[x]
+        return late
+
+    def over(self, x, k):
+        return max(self.weight[x] - self.max_weight[k], 0.0)
+
+    def penalty(self, k, energy, overweight):
+        return CAPACITY_PENALTY * overweight + BATTERY_PENALTY * max(energy - self.battery[k], 0.0)
+
+    def route_cost(self, k):
+        return (self.length[k] + self.penalty(k, self.energy[k], self.overweight[k])
+                + TIME_WINDOW_PENALTY * self.lateness[k])
+
+    def routes_without_starts(self):
+        return [route[1:] for route in self.routes]
+
+    # Each delta method returns the cost change of the move without applying
+    # it, leaving out the change in lateness
+
+    def two_opt_delta(self, k, i, j):
+        """Reverse positions i..j of route k (1 <= i < j)"""
+        route, dist, rate = self.routes[k], self.dist, self.rate[k]
+        a, b, c = route[i - 1], route[i], route[j]
+        dl = dist[a][c] - dist[a][b]
+        de = (dist[a][c] * rate[c] - dist[a][b] * rate[b]
+              + (self.backward[k][j] - self.backward[k][i])
+              - (self.forward[k][j] - self.forward[k][i]))
+        if j + 1 < len(route):
+            e = route[j + 1]
+            dl += dist[b][e] - dist[c][e]
+            de += (dist[b][e] - dist[c][e]) * rate[e]
+        return self.single_route_delta(k, dl, de, 0.0)
+
+    def or_opt_delta(self, k, i, size, p):
+        """Move the `size` deliveries from position i of route k to position p.
+
+        p indexes the route with the segment already taken out.
+        """
+        route, dist, rate = self.routes[k], self.dist, self.rate[k]
+        first, last = route[i], route[i + size - 1]
+        prev = route[i - 1]
+        nxt = route[i + size] if i + size < len(route) else None
+        # Neighbours of the insertion point in the route without the segment
+        u = route[p - 1] if p <= i else route[p - 1 + size]
+        v_index = p if p < i else p + size
+        v = route[v_index] if v_index < len(route) else None
+
+        dl = -dist[prev][first] + dist[u][first]
+        de = -dist[prev][first] * rate[first] + dist[u][first] * rate[first]
+        if nxt is not None:
+            dl += dist[prev][nxt] - dist[last][nxt]
+            de += (dist[prev][nxt] - dist[last][nxt]) * rate[nxt]
+        if v is not None:
+            dl += dist[last][v] - dist[u][v]
+            de += (dist[last][v] - dist[u][v]) * rate[v]
+        return self.single_route_delta(k, dl, de, 0.0)
+
+    def relocate_delta(self, a, i, b, p):
+        """Move the delivery at position i of route a to position p of route b"""
+        dist = self.dist
+        ra, rb = self.rate[a], self.rate[b]
+        route_a, route_b = self.routes[a], self.routes[b]
+        x, prev = route_a[i], route_a[i - 1]
+        dl_a = -dist[prev][x]
+        de_a = -dist[prev][x] * ra[x]
+        if i + 1 < len(route_a):
+            nxt = route_a[i + 1]
+            dl_a += dist[prev][nxt] - dist[x][nxt]
+            de_a += (dist[prev][nxt] - dist[x][nxt]) * ra[nxt]
+        u = route_b[p - 1]
+        dl_b = dist[u][x]
+        de_b = dist[u][x] * rb[x]
+        if p < len(route_b):
+            v = route_b[p]
+            dl_b += dist[x][v] - dist[u][v]
+            de_b += (dist[x][v] - dist[u][v]) * rb[v]
+        return self.two_route_delta(a, dl_a, de_a, -self.over(x, a),
+                                    b, dl_b, de_b, self.over(x, b))
+
+    def exchange_delta(self, a, i, b, j):
+        """Swap the delivery at position i of route a with position j of route b"""
+        x, y = self.routes[a][i], self.routes[b][j]
+        dl_a, de_a = self.replace_delta(a, i, y)
+        dl_b, de_b = self.replace_delta(b, j, x)
+        return self.two_route_delta(a, dl_a, de_a, self.over(y, a) - self.over(x, a),
+                                    b, dl_b, de_b, self.over(x, b) - self.over(y, b))
+
+    def replace_delta(self, k, i, y):
+        """Length and energy change of putting delivery y at position i of route k"""
+        route, dist, rate = self.routes[k], self.dist, self.rate[k]
+        x, prev = route[i], route[i - 1]
+        dl = dist[prev][y] - dist[prev][x]
+        de = dist[prev][y] * rate[y] - dist[prev][x] * rate[x]
+        if i + 1 < len(route):
+            nxt = route[i + 1]
+            dl += dist[y][nxt] - dist[x][nxt]
+            de += (dist[y][nxt] - dist[x][nxt]) * rate[nxt]
+        return dl, de
+
+    def single_route_delta(self, k, dl, de, dw):
+        new = self.length[k] + dl + self.penalty(k, self.energy[k] + de, self.overweight[k] + dw)
+        return new - (self.length[k] + self.penalty(k, self.energy[k], self.overweight[k]))
+
+    def two_route_delta(self, a, dl_a, de_a, dw_a, b, dl_b, de_b, dw_b):
+        return self.single_route_delta(a, dl_a, de_a, dw_a) + self.single_route_delta(b, dl_b, de_b, dw_b)
+
+    # Moves are applied by editing the lists and rebuilding the touched routes
+
+    def lateness_delta(self, move, args):
+        """Exact lateness change of a move, in O(length of the touched routes)"""
+        routes = list(self.routes)
+        for k in touched_routes(move, args):
+            routes[k] = list(routes[k])
+        edit_routes(routes, move, args)
+        return TIME_WINDOW_PENALTY * sum(self.route_lateness(k, routes[k]) - self.lateness[k]
+                                         for k in touched_routes(move, args))
+
+    def apply(self, move, args):
+        edit_routes(self.routes, move, args)
+        for k in touched_routes(move, args):
+            self.rebuild(k)
+
+def touched_routes(move, args):
+    if move in ('two_opt', 'or_opt'):
+        return (args[0],)
+    return (args[0], args[2])
+
+def edit_routes(routes, move, args):
+    """Apply a move to a list of routes in place"""
+    if move == 'two_opt':
+        k, i, j = args
+        routes[k][i:j + 1] = routes[k][i:j + 1][::-1]
+    elif move == 'or_opt':
+        k, i, size, p = args
+        segment = routes[k][i:i + size]
+        del routes[k][i:i + size]
+        routes[k][p:p] = segment
+    elif move == 'relocate':
+        a, i, b, p = args
+        routes[b].insert(p, routes[a].pop(i))
+    else:
+        a, i, b, j = args
+        routes[a][i], routes[b][j] = routes[b][j], routes[a][i]
+
+def random_move(state, rng):
+    """Pick a random applicable move; returns (name, args) or None"""
+    routes = state.routes
+    filled = [k for k, route in enumerate(routes) if len(route) > 1]
+    long_routes = [k for k, route in enumerate(routes) if len(route) > 2]
+    moves = []
+    if long_routes:
+        moves += ['two_opt', 'or_opt']
+    if filled and len(routes) > 1:
+        moves.append('relocate')
+    if len(filled) > 1:
+        moves.append('exchange')
+    if not moves:
+        return None
+
+    move = rng.choice(moves)
+    if move == 'two_opt':
+        k = rng.choice(long_routes)
+        i, j = sorted(rng.sample(range(1, len(routes[k])), 2))
+        return move, (k, i, j)
+    if move == 'or_opt':
+        k = rng.choice(long_routes)
+        size = rng.randint(1, min(3, len(routes[k]) - 2))
+        i = rng.randint(1, len(routes[k]) - size)
+        p = rng.randint(1, len(routes[k]) - size)
+        if p == i:
+            return None
+        return move, (k, i, size, p)
+    if move == 'relocate':
+        a = rng.choice(filled)
+        b = rng.choice([k for k in range(len(routes)) if k != a])
+        return move, (a, rng.randint(1, len(routes[a]) - 1), b, rng.randint(1, len(routes[b])))
+    a, b = rng.sample(filled, 2)
+    return move, (a, rng.randint(1, len(routes[a]) - 1), b, rng.randint(1, len(routes[b]) - 1))
+
+def improve_routes(problem, routes, iterations=20000, time_limit=None, temperature=None,
+                   cooling=0.9995, seed=None, history=None):
+    """Local search over 2-opt, Or-opt, relocate and exchange moves.
+
+    Each iteration prices one random move in constant time and applies it
+    if it lowers the cost or, with a starting `temperature`, under the
+    simulated-annealing rule. Lateness is only recomputed when the move
+    could still pass after every touched route's lateness was removed.
+    Returns the best routes found (one delivery index list per drone). If
+    `history` is a list, (elapsed seconds, cost) is appended to it at
+    every improvement.
+    """
+    rng = random.Random(seed)
+    state = RouteState(problem, routes)
+    best_cost = state.cost
+    best_routes = state.routes_without_starts()
+    started = time.perf_counter()
+    if history is not None:
+        history.append((0.0, best_cost))
+
+    for iteration in range(iterations):
+        if time_limit is not None and iteration % 256 == 0 and time.perf_counter() - started > time_limit:
+            break
+        picked = random_move(state, rng)
+        if picked is None:
+            continue
+        move, args = picked
+        # Accept when delta < threshold (the annealing rule, drawn up front)
+        threshold = -temperature * math.log(1.0 - rng.random()) if temperature else -1e-9
+        delta = getattr(state, move + '_delta')(*args)
+        lower_bound = delta - TIME_WINDOW_PENALTY * sum(state.lateness[k]
+                                                        for k in touched_routes(move, args))
+        if lower_bound < threshold:
+            delta += state.lateness_delta(move, args)
+        if lower_bound < threshold and delta < threshold:
+            state.apply(move, args)
+            state.cost += delta
+            if state.cost < best_cost - 1e-9:
+                best_cost = state.cost
+                best_routes = state.routes_without_starts()
+                if history is not None:
+                    history.append((time.perf_counter() - started, best_cost))
+        if temperature:
+            temperature *= cooling
+    return best_routes
+
+def polish(problem, chromosome, **kwargs):
+    """Run `improve_routes` on a GA chromosome.
+
+    Returns the improved chromosome, or the original one if the full GA cost
+    (time windows included) did not improve.
+    """
+    n = problem['n_deliveries']
+    improved = encode_routes(improve_routes(problem, decode_routes(chromosome, n), **kwargs), n)
+    costs = evaluate_population(problem, [list(chromosome), improved])
+    return improved if costs[1] < costs[0] else list(chromosome)
+
+def optimize_routes_local(drones, deliveries, no_fly_zones, iterations=20000, time_limit=None,
+                          temperature=None, matrices=None, seed=None, history=None):
+    """Local-search alternative to `genetic_algorithm.optimize_routes`.
+
+    Starts from a cheapest-insertion plan and returns the improved
+    chromosome in the GA encoding, so `decode_routes` applies to it.
+    """
+    problem = build_problem(drones, deliveries, matrices)
+    routes = [[] for _ in drones]
+    for i in range(len(deliveries)):
+        insert_cheapest(routes, i, problem)
+    best = improve_routes(problem, routes, iterations, time_limit, temperature,
+                          seed=seed, history=history)
+    return encode_routes(best, len(deliveries))
+
+def optimize_routes_memetic(drones, deliveries, no_fly_zones, iterations=20000,
+                            temperature=None, matrices=None, seed=None, **ga_kwargs):
+    """`optimize_routes` followed by a local-search polish of its best plan"""
+    best, logbook = optimize_routes(drones, deliveries, no_fly_zones, matrices=matrices, **ga_kwargs)
+    problem = build_problem(drones, deliveries, matrices)
+    return polish(problem, best, iterations=iterations, temperature=temperature, seed=seed), logbook
@@ -0,0 +1,86 @@
+import numpy as np
+
+from utils import BASE_ENERGY
+
+def pairwise_distances(a, b):
+    """(len(a), len(b)) Euclidean distance matrix between two point arrays"""
+    a = np.asarray(a, dtype=float).reshape(-1, 2)
+    b = np.asarray(b, dtype=float).reshape(-1, 2)
+    return np.hypot(a[:, None, 0] - b[None, :, 0], a[:, None, 1] - b[None, :, 1])
+
+class DistanceMatrices:
+    """Euclidean distance and energy matrices for a fleet and its deliveries.
+
+    Rows and columns follow the order of the `drones` and `deliveries`
+    lists. `energy_rate[k, d]` uses the same factors as
+    `utils.calculate_energy`, so `drone_dist[k, d] * energy_rate[k, d]`
+    equals `calculate_energy([start_k, pos_d], ...)` for drone k carrying
+    delivery d's package.
+    """
+
+    def __init__(self, drones, deliveries):
+        self.drones = list(drones)
+        self.deliveries = list(deliveries)
+        self.delivery_pos = np.array([d['pos'] for d in self.deliveries], dtype=float).reshape(-1, 2)
+        self.delivery_weight = np.array([d['weight'] for d in self.deliveries], dtype=float)
+        self.drone_pos = np.array([d['start_pos'] for d in self.drones], dtype=float).reshape(-1, 2)
+        self.max_weight = np.array([d['max_weight'] for d in self.drones], dtype=float)
+        self.speed = np.array([d['speed'] for d in self.drones], dtype=float)
+
+        self.delivery_dist = pairwise_distances(self.delivery_pos, self.delivery_pos)
+        self.drone_dist = pairwise_distances(self.drone_pos, self.delivery_pos)
+        self._reindex()
+        self._update_energy()
+
+    def _reindex(self):
+        # Dict identity -> row, so callers can pass the records themselves
+        self.delivery_rows = {id(d): i for i, d in enumerate(self.deliveries)}
+
+    def _update_energy(self):
+        # Energy per unit distance for drone k carrying delivery d's package
+        weight_factor = 1 + self.delivery_weight[None, :] / self.max_weight[:, None]
+        speed_factor = 1 + self.speed[:, None] / 10
+        self.energy_rate = BASE_ENERGY * weight_factor * speed_factor
+
+    def delivery_index(self, delivery):
+        return self.delivery_rows[id(delivery)]
+
+    def energy_lower_bounds(self, drones, origins, deliveries, slack=0):
+        """Euclidean lower bounds on the energy each drone needs to reach each delivery.
+
+        `drones` and `deliveries` are row indices and `origins` the point
+        each drone flies from, usually its current position. `slack` is
+        how far short of the goal the planner may stop. Returns a
+        (len(drones), len(deliveries)) array.
+        """
+        drones = np.asarray(drones, dtype=int)
+        deliveries = np.asarray(deliveries, dtype=int)
+        distance = pairwise_distances(origins, self.delivery_pos[deliveries])
+        return np.maximum(distance - slack, 0) * self.energy_rate[np.ix_(drones, deliveries)]
+
+    def add_delivery(self, delivery):
+        """Append one delivery, computing only its new row and column"""
+        pos = np.array([delivery['pos']], dtype=float)
+        to_deliveries = pairwise_distances(pos, self.delivery_pos)[0]
+        n = len(self.deliveries)
+        dist = np.zeros((n + 1, n + 1))
+        dist[:n, :n] = self.delivery_dist
+        dist[n, :n] = to_deliveries
+        dist[:n, n] = to_deliveries
+        self.delivery_dist = dist
+        self.drone_dist = np.hstack([self.drone_dist, pairwise_distances(self.drone_pos, pos)])
+        self.deliveries.append(delivery)
+        self.delivery_pos = np.vstack([self.delivery_pos, pos])
+        self.delivery_weight = np.append(self.delivery_weight, delivery['weight'])
+        self.delivery_rows[id(delivery)] = n
+        self._update_energy()
+
+    def add_drone(self, drone):
+        """Append one drone, computing only its new row"""
+        pos = np.array([drone['start_pos']], dtype=float)
+        self.drone_dist = np.vstack([self.drone_dist, pairwise_distances(pos, self.delivery_pos)])
+        self.drones.append(drone)
+        self.drone_pos = np.vstack([self.drone_pos, pos])
+        self.max_weight = np.append(self.max_weight, drone['max_weight'])
+        self.speed = np.append(self.speed, drone['speed'])
+        self._update_energy()
@@ -0,0 +1,119 @@
+import argparse
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data import drones, deliveries, no_fly_zones
+from dispatch import POLICIES
+from scenarios import generate_scenario
+from simulation import SimulationEngine
+
+def run_seed(base_seed, run):
+    """Seed of one run, fixed by the batch seed and the run number alone"""
+    return int(np.random.SeedSequence([base_seed, run]).generate_state(1)[0])
+
+def perturb_scenario(rng, drones, deliveries, no_fly_zones, window_jitter=10,
+                     weight_jitter=0.2, fleet_size=None):
+    """Randomized copy of a scenario.
+
+    Time windows shift by up to `window_jitter` minutes at each end and
+    package weights scale by up to +-`weight_jitter`. With `fleet_size`
+    = (low, high) the fleet is resampled from `drones` to a size in that
+    range. The inputs are never modified.
+    """
+    new_deliveries = copy.deepcopy(deliveries)
+    for delivery in new_deliveries:
+        start, end = np.add(delivery['time_window'], rng.uniform(-window_jitter, window_jitter, 2))
+        start = max(float(start), 0.0)
+        end = float(end)
+        delivery['time_window'] = (start, max(end, start + 1))
+        delivery['weight'] *= 1 + rng.uniform(-weight_jitter, weight_jitter)
+
+    if fleet_size is None:
+        new_drones = copy.deepcopy(drones)
+    else:
+        size = rng.integers(fleet_size[0], fleet_size[1] + 1)
+        new_drones = [copy.deepcopy(drones[i]) for i in rng.integers(len(drones), size=size)]
+        for k, drone in enumerate(new_drones):
+            drone['id'] = k + 1
+    return new_drones, new_deliveries, copy.deepcopy(no_fly_zones)
+
+def run_scenario(job):
+    """Worker: simulate one perturbed scenario and return its result row"""
+    run, seed, scenario, perturbation, engine_options = job
+    rng = np.random.default_rng(seed)
+    run_drones, run_deliveries, run_zones = perturb_scenario(rng, *scenario, **perturbation)
+    engine = SimulationEngine(run_drones, run_deliveries, run_zones, **engine_options)
+    engine.reset()
+    started = time.perf_counter()
+    results = engine.run()
+    battery = sum(d['battery'] for d in engine.active_drones)
+    return {
+        'run': run,
+        'seed': seed,
+        'drones': len(run_drones),
+        'deliveries': results['total'],
+        'completed': results['completed'],
+        'failed': results['failed'],
+        'completion_rate': results['completed'] / results['total'] if results['total'] else 0.0,
+        'energy_used': results['energy_used'],
+        'battery_used': results['energy_used'] / battery if battery else 0.0,
+        'sim_time': results['time'],
+        'wall_time': time.perf_counter() - started,
+    }
+
+def run_monte_carlo(n_runs, scenario=None, seed=0, workers=None, perturbation=None,
+                    engine_options=None):
+    """Simulate `n_runs` perturbed variants of a scenario in a process pool.
+
+    `scenario` is a (drones, deliveries, no_fly_zones) tuple and defaults
+    to `data.py`. Run i uses the seed `run_seed(seed, i)`, so a batch
+    reproduces exactly whatever the number of `workers`. `perturbation`
+    is passed to `perturb_scenario` and `engine_options` to
+    `SimulationEngine`. Returns one DataFrame row per run; the batch
+    throughput is in `df.attrs['runs_per_second']`.
+    """
+    scenario = scenario or (drones, deliveries, no_fly_zones)
+    jobs = [(run, run_seed(seed, run), scenario, perturbation or {}, engine_options or {})
+            for run in range(n_runs)]
+    started = time.perf_counter()
+    if workers == 1:
+        rows = list(map(run_scenario, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(run_scenario, jobs, chunksize=max(1, n_runs // 64)))
+    elapsed = time.perf_counter() - started
+
+    df = pd.DataFrame(rows).set_index('run')
+    df.attrs['wall_time'] = elapsed
+    df.attrs['runs_per_second'] = n_runs / elapsed if elapsed else float('inf')
+    return df
+
+def summarize(df):
+    """Mean, std and quantiles of the per-run metrics"""
+    return df[['completion_rate', 'failed', 'battery_used', 'energy_used', 'sim_time']].describe()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-simulate randomized delivery scenarios")
+    parser.add_argument("runs", type=int, nargs="?", default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--planner", default="grid")
+    parser.add_argument("--policy", default="greedy", choices=list(POLICIES))
+    parser.add_argument("--fleet", type=int, nargs=2, metavar=("MIN", "MAX"))
+    parser.add_argument("--scenario", type=int, nargs=3, metavar=("DRONES", "DELIVERIES", "ZONES"),
+                        help="perturb a generated scenario of this size instead of data.py")
+    parser.add_argument("--csv", help="write the per-run rows to this file")
+    args = parser.parse_args()
+
+    scenario = generate_scenario(*args.scenario, seed=args.seed) if args.scenario else None
+    df = run_monte_carlo(args.runs, scenario=scenario, seed=args.seed, workers=args.workers,
+                         perturbation={'fleet_size': args.fleet} if args.fleet else None,
+                         engine_options={'planner': args.planner, 'policy': args.policy})
+    print(summarize(df))
+    print(f"{args.runs} runs in {df.attrs['wall_time']:.1f}s ({df.attrs['runs_per_second']:.1f} runs/s)")
+    if args.csv:
+        df.to_csv(args.csv)
@@ -0,0 +1,53 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from genetic_algorithm import build_problem, optimize_routes
+
+class OptimizerThread(QThread):
+    """Runs `genetic_algorithm.optimize_routes` off the GUI thread.
+
+    The drone and delivery lists are snapshotted when the thread is
+    created, so edits made in the window while it runs do not reach the
+    GA. Progress arrives through Qt signals, which are queued onto the
+    GUI thread; `best` always holds the best chromosome found so far.
+    """
+
+    progress = pyqtSignal(int, float, float)  # generation, best cost, average cost
+    completed = pyqtSignal(object, object)    # best chromosome, logbook
+    failed = pyqtSignal(str)
+
+    def __init__(self, drones, deliveries, no_fly_zones, n_gen=50, matrices=None, state=None,
+                 patience=None, time_limit=None, parent=None):
+        super().__init__(parent)
+        self.drones = list(drones)
+        self.deliveries = list(deliveries)
+        self.no_fly_zones = list(no_fly_zones)
+        self.n_gen = n_gen
+        self.state = state
+        self.patience = patience
+        self.time_limit = time_limit
+        # Built here so the GA never reads the matrices while the window updates them
+        self.problem = build_problem(self.drones, self.deliveries, matrices)
+        self.best = None
+        self.cancelled = False
+
+    def cancel(self):
+        """Ask the GA to stop after the current generation"""
+        self.cancelled = True
+
+    def on_generation(self, gen, best, record):
+        self.best = best
+        self.progress.emit(gen, float(record['min']), float(record['avg']))
+        return self.cancelled
+
+    def run(self):
+        try:
+            best, logbook = optimize_routes(
+                self.drones, self.deliveries, self.no_fly_zones, n_gen=self.n_gen,
+                state=self.state, verbose=False, problem=self.problem,
+                callback=self.on_generation, patience=self.patience,
+                time_limit=self.time_limit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.best = best
+        self.completed.emit(best, logbook)
@@ -0,0 +1,124 @@
+from collections import OrderedDict
+
+from astar import astar, intersects_no_fly_zone, arrival_time, zone_active, heuristic
+
+def path_bounds(path):
+    """Bounding box (minx, miny, maxx, maxy) of a path"""
+    xs = [p[0] for p in path]
+    ys = [p[1] for p in path]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def boxes_intersect(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+class PathCache:
+    """Bounded LRU memoization layer around `astar.astar`.
+
+    Entries are keyed on the endpoints, the planner settings and the IDs
+    and versions of the zones active at some point between departure and
+    the earliest possible arrival (straight line at `speed`), so a failure
+    or detour is not reused once that set changes. A hit is re-checked leg
+    by leg against the zones active while flying it, so a cached path is
+    never returned through a zone that has switched on since it was stored.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.zone_versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def zone_state(self, no_fly_zones, start_time, end_time=None):
+        """IDs and versions of the zones active during [start_time, end_time]"""
+        return frozenset(
+            (zone['id'], self.zone_versions.get(zone['id'], 0))
+            for zone in no_fly_zones
+            if zone_active(zone.get('time_window'), start_time, end_time)
+        )
+
+    def astar(self, start, goal, no_fly_zones, weight, planner="grid",
+              start_time=None, speed=None, **kwargs):
+        """Same as `astar.astar`, served from the cache when possible"""
+        end_time = arrival_time(start_time, heuristic(start, goal), speed)
+        key = (start, goal, weight, planner, speed,
+               self.zone_state(no_fly_zones, start_time, end_time))
+        entry = self.entries.get(key)
+        if entry is not None and self.still_valid(entry['path'], no_fly_zones, start_time, speed):
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry['path']
+
+        self.misses += 1
+        path = astar(start, goal, no_fly_zones, weight, planner=planner,
+                     start_time=start_time, speed=speed, **kwargs)
+        self.entries[key] = {
+            'path': path,
+            'time': start_time,
+            'end_time': end_time,
+            'bounds': path_bounds(path) if path else None,
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return path
+
+    def still_valid(self, path, no_fly_zones, start_time, speed):
+        """Whether a cached path is still clear of zones at this departure time"""
+        if path is None or start_time is None:
+            return True
+        flown = 0
+        for i in range(len(path) - 1):
+            leg = heuristic(path[i], path[i+1])
+            if intersects_no_fly_zone(path[i], path[i+1], no_fly_zones,
+                                      arrival_time(start_time, flown, speed),
+                                      arrival_time(start_time, flown + leg, speed)):
+                return False
+            flown += leg
+        return True
+
+    def invalidate_zone(self, zone, old_polygon=None):
+        """Record that `zone` was added or edited.
+
+        Only entries whose path bounding box meets the zone's bounding box
+        (old or new) are dropped, along with cached failures, which a
+        changed zone may turn into successes. The others are re-keyed under
+        the zone's new version and stay in the cache.
+        """
+        zone_id = zone['id']
+        version = self.zone_versions.get(zone_id, 0) + 1
+        self.zone_versions[zone_id] = version
+
+        boxes = [path_bounds(zone['polygon'])]
+        if old_polygon:
+            boxes.append(path_bounds(old_polygon))
+
+        kept = OrderedDict()
+        for key, entry in self.entries.items():
+            if entry['bounds'] is None or any(boxes_intersect(entry['bounds'], b) for b in boxes):
+                self.invalidations += 1
+                continue
+            state = frozenset(s for s in key[-1] if s[0] != zone_id)
+            if zone_active(zone.get('time_window'), entry['time'], entry['end_time']):
+                state = state | {(zone_id, version)}
+            kept[key[:-1] + (state,)] = entry
+        self.entries = kept
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
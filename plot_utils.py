@@ -204,4 +204,17 @@ def plot_statistics(ax, completed_deliveries, failed_deliveries, drone_stats):
         ax3.set_xlabel('Priority (1-5)')
         ax3.set_ylabel('Number of Deliveries')
     
-    ax.figure.tight_layout()
\ No newline at end of file
+    ax.figure.tight_layout()
+
+def plot_convergence(ax, generations, best, avg):
+    """Plot the GA's best and average route cost per generation"""
+    ax.figure.clear()
+    ax = ax.figure.add_subplot(111)
+    ax.plot(generations, best, label='Best')
+    ax.plot(generations, avg, label='Average', alpha=0.7)
+    ax.set_title('Route Optimization')
+    ax.set_xlabel('Generation')
+    ax.set_ylabel('Route Cost')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend()
+    return ax
@@ -0,0 +1,204 @@
+import numpy as np
+
+class RecordView:
+    """Dict-like view of one row of a `RecordStore`.
+
+    Reads and writes go straight to the store's columns, so code written
+    for the dict records of `data.py` (`drone['battery_left'] -= e`,
+    `delivery.get('priority')`) works unchanged. A store hands out one
+    view per row, so views keep their identity like dicts do.
+    """
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.store.get(self.row, key)
+
+    def __setitem__(self, key, value):
+        self.store.set(self.row, key, value)
+
+    def __contains__(self, key):
+        return key in self.store.FIELDS
+
+    def get(self, key, default=None):
+        return self[key] if key in self.store.FIELDS else default
+
+    def keys(self):
+        return self.store.FIELDS.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self.store.FIELDS]
+
+    def copy(self):
+        """Plain dict snapshot of the row"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.copy()})"
+
+class DeliveryRecord(RecordView):
+    __slots__ = ()
+
+class DroneRecord(RecordView):
+    __slots__ = ()
+
+class RecordStore:
+    """Struct-of-arrays storage for records with a fixed set of keys.
+
+    `FIELDS` maps each key to (dtype, width, fill): width 2 columns hold
+    points and windows and read back as tuples, and `fill` is stored for
+    a missing or None value. For keys in `OPTIONAL` the fill value reads
+    back as None. Columns over-allocate so `append` is amortized O(1);
+    `column(key)` is the live slice of the rows in use. Iterating or
+    indexing yields `RecordView`s.
+    """
+
+    FIELDS = {}
+    OPTIONAL = set()
+    view_type = RecordView
+
+    def __init__(self, records=()):
+        records = list(records)
+        self.size = len(records)
+        self.columns = {key: self.empty(key, max(self.size, 8)) for key in self.FIELDS}
+        for key in self.FIELDS:
+            values = [self.encode(key, record.get(key)) for record in records]
+            if values:
+                self.columns[key][:self.size] = values
+        self.views = [self.view_type(self, row) for row in range(self.size)]
+
+    def empty(self, key, capacity):
+        dtype, width, fill = self.FIELDS[key]
+        column = np.empty((capacity, width) if width > 1 else capacity, dtype=dtype)
+        column[...] = fill
+        return column
+
+    def encode(self, key, value):
+        if value is not None:
+            return value
+        dtype, width, fill = self.FIELDS[key]
+        return (fill,) * width if width > 1 else fill
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def __getitem__(self, row):
+        return self.views[row]
+
+    def column(self, key):
+        return self.columns[key][:self.size]
+
+    def get(self, row, key):
+        dtype, width, fill = self.FIELDS[key]
+        value = self.columns[key][row]
+        if width > 1:
+            return tuple(value.tolist())
+        if dtype is object:
+            return value
+        value = value.item()
+        return None if key in self.OPTIONAL and value == fill else value
+
+    def set(self, row, key, value):
+        self.columns[key][row] = self.encode(key, value)
+
+    def append(self, record):
+        """Add a record given as a dict (or view); returns its view"""
+        if self.size == len(self.columns[next(iter(self.FIELDS))]):
+            for key, column in self.columns.items():
+                grown = self.empty(key, 2 * len(column))
+                grown[:self.size] = column[:self.size]
+                self.columns[key] = grown
+        row = self.size
+        self.size += 1
+        for key in self.FIELDS:
+            self.set(row, key, record.get(key))
+        self.views.append(self.view_type(self, row))
+        return self.views[row]
+
+    def select(self, mask):
+        """Views of the rows where a boolean mask over `column()`s is set"""
+        return [self.views[row] for row in np.flatnonzero(mask)]
+
+    def copy(self):
+        """Independent store with the same rows and new views"""
+        store = type(self).__new__(type(self))
+        store.size = self.size
+        store.columns = {key: column.copy() for key, column in self.columns.items()}
+        store.views = [self.view_type(store, row) for row in range(self.size)]
+        return store
+
+    def to_dicts(self):
+        return [view.copy() for view in self.views]
+
+class DeliveryStore(RecordStore):
+    """Deliveries in the schema of `data.py`, plus the simulation status.
+
+    `utils.get_available_deliveries` filters a store with column masks.
+    `SimulationEngine` keeps its own id-keyed status dicts instead, since
+    a dispatch only touches the open deliveries, not every row.
+    """
+
+    FIELDS = {
+        'id': (np.int64, 1, 0),
+        'pos': (np.float64, 2, np.nan),
+        'weight': (np.float64, 1, np.nan),
+        'priority': (np.int8, 1, 0),
+        'time_window': (np.float64, 2, np.nan),
+        'assigned': (np.bool_, 1, False),
+        'drone_id': (np.int64, 1, -1),
+    }
+    OPTIONAL = {'drone_id'}
+    view_type = DeliveryRecord
+
+    def reset(self):
+        """Every delivery back to unassigned"""
+        self.column('assigned')[:] = False
+        self.column('drone_id')[:] = -1
+
+class DroneStore(RecordStore):
+    """Drones in the schema of `data.py`, plus their simulation state.
+
+    `assigned_delivery` holds the delivery record itself, so it is an
+    object column. Drones stored without a `current_pos` start at their
+    `start_pos`, and without a `battery_left` with a full `battery`.
+    """
+
+    FIELDS = {
+        'id': (np.int64, 1, 0),
+        'max_weight': (np.float64, 1, np.nan),
+        'battery': (np.float64, 1, np.nan),
+        'speed': (np.float64, 1, np.nan),
+        'start_pos': (np.float64, 2, np.nan),
+        'current_pos': (np.float64, 2, np.nan),
+        'battery_left': (np.float64, 1, np.nan),
+        'assigned_delivery': (object, 1, None),
+    }
+    view_type = DroneRecord
+
+    def __init__(self, records=()):
+        super().__init__(records)
+        unplaced = np.isnan(self.column('current_pos')[:, 0])
+        self.column('current_pos')[unplaced] = self.column('start_pos')[unplaced]
+        uncharged = np.isnan(self.column('battery_left'))
+        self.column('battery_left')[uncharged] = self.column('battery')[uncharged]
+
+    def append(self, record):
+        view = super().append(record)
+        if record.get('current_pos') is None:
+            view['current_pos'] = view['start_pos']
+        if record.get('battery_left') is None:
+            view['battery_left'] = view['battery']
+        return view
+
+    def reset(self):
+        """Every drone back at its start with a full battery"""
+        self.column('current_pos')[:] = self.column('start_pos')
+        self.column('battery_left')[:] = self.column('battery')
+        self.column('assigned_delivery')[:] = None
@@ -0,0 +1,100 @@
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from astar import MAP_BOUNDS
+
+def random_polygons(rng, centers, size, vertices):
+    """Star-shaped polygons around `centers`: random radii at jittered angles"""
+    polygons = []
+    for center in centers:
+        n = rng.integers(vertices[0], vertices[1] + 1)
+        # Gaps between corners stay under pi, which keeps the polygon simple
+        angles = (np.arange(n) + rng.uniform(-0.2, 0.2, n)) * 2 * np.pi / n
+        angles += rng.uniform(0, 2 * np.pi)
+        radii = rng.uniform(size[0], size[1], n) / 2
+        xs = center[0] + radii * np.cos(angles)
+        ys = center[1] + radii * np.sin(angles)
+        polygons.append([(round(x, 2), round(y, 2)) for x, y in zip(xs.tolist(), ys.tolist())])
+    return polygons
+
+def demand_points(rng, n, bounds, clusters, cluster_spread):
+    """Uniform points, or points drawn around `clusters` Gaussian hotspots"""
+    low, high = np.array(bounds[:2], dtype=float), np.array(bounds[2:], dtype=float)
+    if not clusters:
+        return rng.uniform(low, high, (n, 2))
+    hotspots = rng.uniform(low, high, (clusters, 2))
+    points = hotspots[rng.integers(clusters, size=n)] + rng.normal(0, cluster_spread, (n, 2))
+    return np.clip(points, low, high)
+
+def generate_scenario(n_drones=5, n_deliveries=20, n_zones=3, seed=0, bounds=MAP_BOUNDS,
+                      horizon=120, clusters=0, cluster_spread=5.0, window_length=(20, 60),
+                      zone_size=(10, 25), zone_vertices=(3, 8), zone_overlap=0.0,
+                      static_zones=0.5, avoid_zones=True):
+    """Seeded random scenario in the schema of `data.py`.
+
+    Returns (drones, deliveries, no_fly_zones). Tuning knobs:
+
+    - density: `n_deliveries` over the area of `bounds`
+    - clustered demand: with `clusters` > 0, deliveries gather around that
+      many hotspots with a standard deviation of `cluster_spread`
+    - time-window tightness: windows last `window_length` (min, max)
+      minutes and open anywhere in [0, horizon - length]
+    - zone overlap: that share of zones is centred inside an earlier zone
+    - `static_zones`: share of zones active for the whole horizon; the
+      others switch on and off at random times
+
+    Zones are irregular star-shaped polygons of `zone_vertices` corners
+    and `zone_size` diameter. With `avoid_zones`, deliveries that fall
+    inside a zone are redrawn, up to a few times.
+    """
+    rng = np.random.default_rng(seed)
+    low, high = np.array(bounds[:2], dtype=float), np.array(bounds[2:], dtype=float)
+
+    centers = rng.uniform(low, high, (n_zones, 2))
+    for z in range(1, n_zones):
+        if rng.random() < zone_overlap:
+            parent = centers[rng.integers(z)]
+            centers[z] = np.clip(parent + rng.uniform(-zone_size[0], zone_size[0], 2) / 2, low, high)
+    polygons = random_polygons(rng, centers, zone_size, zone_vertices)
+    no_fly_zones = []
+    for z, polygon in enumerate(polygons):
+        if rng.random() < static_zones:
+            window = (0, horizon)
+        else:
+            start = float(rng.uniform(0, horizon * 0.75))
+            end = min(start + float(rng.uniform(15, horizon / 2)), horizon)
+            window = (round(start, 1), round(end, 1))
+        no_fly_zones.append({"id": z + 1, "polygon": polygon, "time_window": window})
+
+    positions = demand_points(rng, n_deliveries, bounds, clusters, cluster_spread)
+    if avoid_zones and no_fly_zones:
+        tree = shapely.STRtree([Polygon(zone['polygon']) for zone in no_fly_zones])
+        for _ in range(5):
+            inside = np.unique(tree.query(shapely.points(positions), predicate='within')[0])
+            if not len(inside):
+                break
+            positions[inside] = demand_points(rng, len(inside), bounds, clusters, cluster_spread)
+
+    lengths = rng.uniform(window_length[0], window_length[1], n_deliveries)
+    starts = rng.uniform(0, np.maximum(horizon - lengths, 0))
+    weights = rng.uniform(0.5, 5.0, n_deliveries)
+    priorities = rng.integers(1, 6, n_deliveries)
+    deliveries = [
+        {"id": i + 1, "pos": (round(x, 2), round(y, 2)), "weight": round(w, 1),
+         "priority": int(p), "time_window": (round(s, 1), round(s + l, 1))}
+        for i, ((x, y), w, p, s, l) in enumerate(zip(positions.tolist(), weights.tolist(),
+                                                     priorities, starts.tolist(), lengths.tolist()))
+    ]
+
+    origins = rng.uniform(low, high, (n_drones, 2))
+    max_weights = rng.uniform(2.0, 6.0, n_drones)
+    batteries = rng.uniform(8000, 20000, n_drones)
+    speeds = rng.uniform(5.0, 12.0, n_drones)
+    drones = [
+        {"id": k + 1, "max_weight": round(m, 1), "battery": round(b, -2), "speed": round(v, 1),
+         "start_pos": (round(x, 2), round(y, 2))}
+        for k, ((x, y), m, b, v) in enumerate(zip(origins.tolist(), max_weights.tolist(),
+                                                  batteries.tolist(), speeds.tolist()))
+    ]
+    return drones, deliveries, no_fly_zones
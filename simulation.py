@@ -0,0 +1,378 @@
+import heapq
+from itertools import count
+
+import numpy as np
+
+from astar import ZoneIndex, goal_tolerance, arrival_time
+from dispatch import make_policy
+from matrices import DistanceMatrices
+from path_cache import PathCache
+from records import DeliveryStore, DroneStore
+from spatial_index import GridIndex
+from utils import batch_energy, calculate_energy, flatten_paths, get_available_drones, path_length
+
+# Order of simultaneous events: window closes are handled after the
+# dispatch that follows the others, so a delivery can still go out at the
+# last minute of its window
+ARRIVAL, ZONE_CHANGE, WINDOW_OPEN, WINDOW_CLOSE = range(4)
+
+class SimulationEngine:
+    """Delivery simulation without any GUI dependency.
+
+    Owns the fleet, the deliveries, the no-fly zones and the clock, plus
+    the zone index, path cache and distance matrices built from them.
+    `drones` and `deliveries` are lists of dicts as in `data.py`, or the
+    array-backed `records.DroneStore` and `records.DeliveryStore`.
+
+    Time advances from event to event on a heap: delivery windows opening
+    and closing, drones arriving, zones switching on and off. `step()`
+    jumps to the next event time, handles every event due then and
+    lets the dispatch `policy` (see `dispatch.POLICIES`) send idle drones
+    to open deliveries; `run()` steps until every delivery is done or
+    `end_time` is passed. A dispatched drone is busy until it has flown
+    its path at `drone['speed']`.
+
+    Before each dispatch round every (idle drone, open delivery) pair is
+    screened at once with `screen()`: pairs whose package is too heavy,
+    whose window is not open, or whose straight-line flight already needs
+    more battery than is left are rejected without a path search.
+    `prefilter` counts the pairs screened, the pairs rejected and the
+    path searches the rejections saved: `plan()` calls refused, plus
+    rejected pairs a policy drops from its candidates without calling
+    `plan()` (policies that do so add those to 'searches_saved').
+
+    Observers register with `subscribe(event, callback)`. Each callback
+    gets one event dict with 'type' and 'time' keys plus event-specific
+    fields:
+
+        started             -
+        delivery_assigned   drone, delivery, path, energy, arrival
+        delivery_completed  drone, delivery
+        delivery_failed     delivery, reason
+        zone_changed        zone, active
+        error               message
+        finished            results (see `results()`)
+    """
+
+    def __init__(self, drones, deliveries, no_fly_zones, planner="grid", policy="greedy",
+                 end_time=120, cache_capacity=1024):
+        self.drones = drones
+        self.deliveries = deliveries
+        self.no_fly_zones = no_fly_zones
+        self.planner = planner  # see astar.PLANNERS
+        self.policy = make_policy(policy)
+        self.end_time = end_time
+        self.zone_index = ZoneIndex(no_fly_zones)
+        self.path_cache = PathCache(capacity=cache_capacity)
+        self.matrices = DistanceMatrices(drones, deliveries)
+        self.delivery_grid = GridIndex()  # every delivery, for hit tests
+        for delivery in deliveries:
+            self.delivery_grid.insert(delivery, delivery['pos'])
+        self.open_grid = GridIndex()      # open deliveries
+        self.drone_grid = GridIndex()     # idle drones at their current position
+        self.planned_drone = {}  # id(delivery) -> drone row from the last optimization
+        self.listeners = {}
+        self.running = False
+        self.current_time = 0
+        self.queue = []
+        self.sequence = count()
+        self.events_handled = 0
+        # Status sets as insertion-ordered id(record) -> record dicts, for O(1) updates
+        self.pending_deliveries = {}  # neither dispatched nor failed
+        self.open_deliveries = {}     # pending and inside their time window
+        self.active_drones = []
+        self.idle_drones = {}
+        self.drone_rows = {}
+        self.completed_deliveries = []
+        self.failed_deliveries = []
+        self.screened = None  # (drone columns, delivery columns, bounds) of this round
+        self.prefilter = {'pairs': 0, 'rejected': 0, 'searches_saved': 0}
+
+    def subscribe(self, event, callback):
+        """Call `callback(event_dict)` whenever `event` is emitted"""
+        self.listeners.setdefault(event, []).append(callback)
+
+    def schedule(self, time, kind, payload):
+        heapq.heappush(self.queue, (time, kind, next(self.sequence), payload))
+
+    def emit(self, event, **fields):
+        fields.update(type=event, time=self.current_time)
+        for callback in self.listeners.get(event, []):
+            callback(fields)
+
+    def add_drone(self, drone):
+        """Add a drone; returns its record (a view when `drones` is a `DroneStore`)"""
+        if isinstance(self.drones, DroneStore):
+            drone = self.drones.append(drone)
+        else:
+            self.drones.append(drone)
+        self.matrices.add_drone(drone)
+        return drone
+
+    def add_delivery(self, delivery):
+        """Add a delivery; returns its record (a view when `deliveries` is a `DeliveryStore`)"""
+        if isinstance(self.deliveries, DeliveryStore):
+            delivery = self.deliveries.append(delivery)
+        else:
+            self.deliveries.append(delivery)
+        self.matrices.add_delivery(delivery)
+        self.delivery_grid.insert(delivery, delivery['pos'])
+        return delivery
+
+    def add_zone(self, zone):
+        self.no_fly_zones.append(zone)
+        self.zone_index = ZoneIndex(self.no_fly_zones)
+        self.path_cache.invalidate_zone(zone)
+
+    def reset(self):
+        """Put every drone back at its start and every delivery back in the queue"""
+        self.running = False
+        if isinstance(self.drones, DroneStore):
+            self.drones.reset()
+        else:
+            for drone in self.drones:
+                drone['current_pos'] = drone['start_pos']
+                drone['battery_left'] = drone['battery']
+                drone['assigned_delivery'] = None
+        if isinstance(self.deliveries, DeliveryStore):
+            self.deliveries.reset()
+        else:
+            for delivery in self.deliveries:
+                delivery['assigned'] = False
+                delivery['drone_id'] = None
+
+    def start(self, start_time=0):
+        """Begin a run; the simulated drones are copies of `drones`"""
+        self.running = True
+        self.current_time = start_time
+        self.queue = []
+        self.events_handled = 0
+        self.pending_deliveries = {id(d): d for d in self.deliveries}
+        self.open_deliveries = {}
+        if isinstance(self.drones, DroneStore):
+            # One array copy per column instead of one dict copy per drone
+            self.active_drones = list(self.drones.copy())
+        else:
+            self.active_drones = [drone.copy() for drone in self.drones]
+        self.idle_drones = {id(d): d for d in self.active_drones}
+        self.open_grid = GridIndex()
+        self.drone_grid = GridIndex()
+        for drone in self.active_drones:
+            self.drone_grid.insert(drone, drone['current_pos'])
+        # Matrix rows of the simulated drone copies
+        self.drone_rows = {id(drone): k for k, drone in enumerate(self.active_drones)}
+        self.completed_deliveries = []
+        self.failed_deliveries = []
+        self.screened = None
+        self.prefilter = {'pairs': 0, 'rejected': 0, 'searches_saved': 0}
+
+        for delivery in self.deliveries:
+            opens, closes = delivery['time_window']
+            # Windows that closed before the start only fail
+            if closes >= start_time:
+                self.schedule(max(opens, start_time), WINDOW_OPEN, delivery)
+            self.schedule(max(closes, start_time), WINDOW_CLOSE, delivery)
+        for zone in self.no_fly_zones:
+            window = zone.get('time_window')
+            if window is None:
+                continue
+            for time, active in zip(window, (True, False)):
+                if time > start_time:
+                    self.schedule(time, ZONE_CHANGE, (zone, active))
+        self.emit('started')
+
+    def step(self):
+        """Handle the events at the next event time; returns False once finished"""
+        if not self.running:
+            return False
+        if self.exhausted():
+            self.finish()
+            return False
+
+        self.current_time = self.queue[0][0]
+        closing = []
+        while self.queue and self.queue[0][0] == self.current_time:
+            _, kind, _, payload = heapq.heappop(self.queue)
+            self.events_handled += 1
+            if kind == WINDOW_CLOSE:
+                closing.append(payload)
+            elif kind == WINDOW_OPEN:
+                if id(payload) in self.pending_deliveries:
+                    self.open_deliveries[id(payload)] = payload
+                    self.open_grid.insert(payload, payload['pos'])
+            elif kind == ARRIVAL:
+                self.arrive(*payload)
+            else:
+                zone, active = payload
+                self.emit('zone_changed', zone=zone, active=active)
+
+        self.dispatch()
+
+        for delivery in closing:
+            if self.pending_deliveries.pop(id(delivery), None) is not None:
+                if self.open_deliveries.pop(id(delivery), None) is not None:
+                    self.open_grid.remove(delivery)
+                self.failed_deliveries.append(delivery)
+                self.emit('delivery_failed', delivery=delivery, reason="Time window expired")
+        return True
+
+    def advance(self, until):
+        """Handle every event up to time `until`; returns False once finished"""
+        while self.running and (self.exhausted() or self.queue[0][0] <= until):
+            self.step()
+        return self.running
+
+    def exhausted(self):
+        """Whether nothing is left to simulate before `end_time`"""
+        return (not self.queue or self.queue[0][0] > self.end_time
+                or not (self.pending_deliveries or len(self.idle_drones) < len(self.active_drones)))
+
+    def dispatch(self):
+        """Let the policy send idle drones to the open deliveries"""
+        available_drones = get_available_drones(list(self.idle_drones.values()), self.current_time)
+        if available_drones and self.open_deliveries:
+            deliveries = list(self.open_deliveries.values())
+            self.screened = ({id(d): i for i, d in enumerate(available_drones)},
+                             {id(d): j for j, d in enumerate(deliveries)},
+                             self.screen(available_drones, deliveries))
+            try:
+                self.policy.dispatch(self, deliveries, available_drones)
+            finally:
+                self.screened = None
+
+    def screen(self, drones, deliveries):
+        """(drones, deliveries) energy lower bounds, inf for pairs that cannot work.
+
+        Bounds come from straight-line distances (see
+        `DistanceMatrices.energy_lower_bounds`). A pair is rejected when
+        the package is over the drone's max weight, the delivery window
+        is not open now, or the bound exceeds the battery left.
+        """
+        matrices = self.matrices
+        rows = [self.drone_rows[id(d)] for d in drones]
+        origins = [d['current_pos'] for d in drones]
+        cols = [matrices.delivery_index(d) for d in deliveries]
+        bounds = matrices.energy_lower_bounds(rows, origins, cols, slack=goal_tolerance(self.planner))
+        windows = np.array([d['time_window'] for d in deliveries], dtype=float).reshape(-1, 2)
+        battery = np.array([d['battery_left'] for d in drones], dtype=float)
+        feasible = ((matrices.delivery_weight[cols][None, :] <= matrices.max_weight[rows][:, None])
+                    & ((windows[:, 0] <= self.current_time) & (self.current_time <= windows[:, 1]))[None, :]
+                    & (bounds <= battery[:, None]))
+        self.prefilter['pairs'] += feasible.size
+        self.prefilter['rejected'] += feasible.size - int(feasible.sum())
+        return np.where(feasible, bounds, np.inf)
+
+    def lower_bounds(self, drones, deliveries):
+        """`screen()` bounds, taken from the current round when it covers the pairs"""
+        if self.screened:
+            drone_cols, delivery_cols, bounds = self.screened
+            try:
+                rows = [drone_cols[id(d)] for d in drones]
+                cols = [delivery_cols[id(d)] for d in deliveries]
+            except KeyError:
+                pass
+            else:
+                return bounds[np.ix_(rows, cols)]
+        return self.screen(drones, deliveries)
+
+    def lower_bound(self, drone, delivery):
+        """`lower_bounds()` of a single pair"""
+        if self.screened:
+            drone_cols, delivery_cols, bounds = self.screened
+            i, j = drone_cols.get(id(drone)), delivery_cols.get(id(delivery))
+            if i is not None and j is not None:
+                return bounds[i, j]
+        return self.screen([drone], [delivery])[0, 0]
+
+    def arrive(self, drone, delivery):
+        drone['current_pos'] = delivery['pos']
+        self.idle_drones[id(drone)] = drone
+        self.drone_grid.insert(drone, drone['current_pos'])
+        self.completed_deliveries.append(delivery)
+        self.emit('delivery_completed', drone=drone, delivery=delivery)
+
+    def route(self, drone, delivery):
+        """Path for `drone` flying to `delivery` now, or None if it is screened out or blocked"""
+        try:
+            if self.lower_bound(drone, delivery) == np.inf:
+                self.prefilter['searches_saved'] += 1
+                return None
+
+            return self.path_cache.astar(
+                drone['current_pos'], delivery['pos'],
+                self.zone_index, delivery['weight'],
+                planner=self.planner,
+                start_time=self.current_time,
+                speed=drone.get('speed')) or None
+
+        except Exception as e:
+            self.emit('error', message=f"Error processing delivery: {str(e)}")
+            return None
+
+    def plan(self, drone, delivery):
+        """(path, energy) for `drone` flying to `delivery` now, or None if it cannot"""
+        path = self.route(drone, delivery)
+        if not path:
+            return None
+        energy_needed = calculate_energy(path, drone, delivery['weight'])
+        if energy_needed > drone['battery_left']:
+            return None
+        return path, energy_needed
+
+    def plan_many(self, pairs):
+        """`plan()` for a list of (drone, delivery) pairs, energies in one `batch_energy` pass"""
+        paths = [self.route(drone, delivery) for drone, delivery in pairs]
+        found = [k for k, path in enumerate(paths) if path]
+        plans = [None] * len(pairs)
+        if not found:
+            return plans
+        drones = [pairs[k][0] for k in found]
+        energies = batch_energy(*flatten_paths([paths[k] for k in found]),
+                                [d['max_weight'] for d in drones], [d['speed'] for d in drones],
+                                [pairs[k][1]['weight'] for k in found])
+        for k, drone, energy in zip(found, drones, energies.tolist()):
+            if energy <= drone['battery_left']:
+                plans[k] = paths[k], energy
+        return plans
+
+    def commit(self, drone, delivery, path, energy):
+        """Send `drone` off along a path returned by `plan`"""
+        drone['battery_left'] -= energy
+        drone['assigned_delivery'] = delivery
+        delivery['assigned'] = True
+        delivery['drone_id'] = drone['id']
+        del self.pending_deliveries[id(delivery)]
+        del self.open_deliveries[id(delivery)]
+        self.open_grid.remove(delivery)
+        del self.idle_drones[id(drone)]
+        self.drone_grid.remove(drone)
+        arrival = arrival_time(self.current_time, path_length(path), drone.get('speed'))
+        self.schedule(arrival, ARRIVAL, (drone, delivery))
+        self.emit('delivery_assigned', drone=drone, delivery=delivery,
+                  path=path, energy=energy, arrival=arrival)
+
+    def run(self, start_time=0):
+        """Simulate to the end without pausing; returns `results()`"""
+        self.start(start_time)
+        while self.step():
+            pass
+        return self.results()
+
+    def finish(self):
+        self.running = False
+        self.emit('finished', results=self.results())
+
+    def results(self):
+        """Summary of the current run as a dict"""
+        return {
+            'time': self.current_time,
+            'total': len(self.deliveries),
+            'completed': len(self.completed_deliveries),
+            'failed': len(self.failed_deliveries),
+            'pending': len(self.pending_deliveries),
+            'in_flight': len(self.active_drones) - len(self.idle_drones),
+            'events': self.events_handled,
+            'energy_used': sum(d['battery'] - d['battery_left'] for d in self.active_drones),
+            'path_cache': self.path_cache.stats(),
+            'prefilter': dict(self.prefilter),
+        }
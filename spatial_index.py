@@ -0,0 +1,123 @@
+import math
+
+from astar import MAP_BOUNDS
+
+class GridIndex:
+    """Uniform-grid spatial index over objects with 2D positions.
+
+    Objects are bucketed by the `cell_size` square they fall in and keyed
+    by identity, so dict records can be inserted directly. Moving an
+    object only touches its old and new bucket. Radius queries scan the
+    cells overlapping the query circle; k-nearest queries scan rings of
+    cells outwards until no unscanned cell can hold anything closer.
+    """
+
+    def __init__(self, cell_size=10, origin=MAP_BOUNDS[:2]):
+        self.cell_size = cell_size
+        self.origin = origin
+        self.cells = {}
+        self.items = {}  # id(obj) -> (obj, pos, cell)
+        self.extent = None  # (min cx, min cy, max cx, max cy) of the cells ever used
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, obj):
+        return id(obj) in self.items
+
+    def cell(self, pos):
+        return (math.floor((pos[0] - self.origin[0]) / self.cell_size),
+                math.floor((pos[1] - self.origin[1]) / self.cell_size))
+
+    def insert(self, obj, pos):
+        """Add `obj` at `pos`, or move it there if it is already indexed"""
+        if id(obj) in self.items:
+            self.remove(obj)
+        cell = self.cell(pos)
+        self.cells.setdefault(cell, {})[id(obj)] = obj
+        self.items[id(obj)] = (obj, pos, cell)
+        if self.extent is None:
+            self.extent = cell + cell
+        else:
+            x0, y0, x1, y1 = self.extent
+            self.extent = (min(x0, cell[0]), min(y0, cell[1]), max(x1, cell[0]), max(y1, cell[1]))
+
+    move = insert
+
+    def remove(self, obj):
+        """Drop `obj`; objects that are not indexed are ignored"""
+        entry = self.items.pop(id(obj), None)
+        if entry is None:
+            return
+        bucket = self.cells[entry[2]]
+        del bucket[id(obj)]
+        if not bucket:
+            del self.cells[entry[2]]
+
+    def position(self, obj):
+        return self.items[id(obj)][1]
+
+    def ring(self, center, r):
+        """Cells at Chebyshev distance exactly `r` from `center`"""
+        cx, cy = center
+        if r == 0:
+            yield center
+            return
+        for x in range(cx - r, cx + r + 1):
+            yield (x, cy - r)
+            yield (x, cy + r)
+        for y in range(cy - r + 1, cy + r):
+            yield (cx - r, y)
+            yield (cx + r, y)
+
+    def radius(self, pos, r):
+        """Objects within distance `r` of `pos`, nearest first"""
+        x0, y0 = self.cell((pos[0] - r, pos[1] - r))
+        x1, y1 = self.cell((pos[0] + r, pos[1] + r))
+        found = []
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # Bigger than the occupied grid: walk the buckets instead
+            buckets = self.cells.values()
+        else:
+            buckets = [self.cells[c] for c in ((x, y) for x in range(x0, x1 + 1)
+                                                for y in range(y0, y1 + 1)) if c in self.cells]
+        for bucket in buckets:
+            for key, obj in bucket.items():
+                p = self.items[key][1]
+                d = math.hypot(p[0] - pos[0], p[1] - pos[1])
+                if d <= r:
+                    found.append((d, obj))
+        found.sort(key=lambda item: item[0])
+        return [obj for _, obj in found]
+
+    def nearest(self, pos, k=1, max_radius=math.inf, where=None):
+        """Up to `k` objects nearest to `pos` within `max_radius`, nearest first.
+
+        `where` optionally filters the candidates; rejected objects do not
+        count towards `k`.
+        """
+        if not self.items or k <= 0:
+            return []
+        center = self.cell(pos)
+        x0, y0, x1, y1 = self.extent
+        last_ring = max(center[0] - x0, x1 - center[0], center[1] - y0, y1 - center[1])
+        found = []
+        r = 0
+        while r <= last_ring:
+            for cell in self.ring(center, r):
+                for key, obj in self.cells.get(cell, {}).items():
+                    p = self.items[key][1]
+                    d = math.hypot(p[0] - pos[0], p[1] - pos[1])
+                    if d <= max_radius and (where is None or where(obj)):
+                        found.append((d, obj))
+            # Anything in a ring beyond r is at least r cells away
+            reach = r * self.cell_size
+            if reach >= max_radius:
+                break
+            if len(found) >= k:
+                found.sort(key=lambda item: item[0])
+                if found[k - 1][0] <= reach:
+                    break
+            r += 1
+        found.sort(key=lambda item: item[0])
+        return [obj for _, obj in found[:k]]
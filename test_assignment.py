@@ -0,0 +1,31 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from assignment import hungarian, min_cost_assignment
+from scenarios import generate_scenario
+
+def brute_force_assignment(cost):
+    n, m = cost.shape
+    return min(sum(cost[i, j] for i, j in enumerate(cols))
+               for cols in itertools.permutations(range(m), n))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_hungarian_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    drones, deliveries, _ = generate_scenario(rng.integers(1, 6), 6, 0, seed=seed)
+    origins = np.array([d['start_pos'] for d in drones])
+    targets = np.array([d['pos'] for d in deliveries])
+    cost = np.hypot(*(origins[:, None, :] - targets[None, :, :]).transpose(2, 0, 1))
+    cols = hungarian(cost)
+    assert len(set(cols)) == len(cols)
+    assert cost[np.arange(len(cols)), cols].sum() == pytest.approx(brute_force_assignment(cost))
+
+def test_min_cost_assignment_skips_forbidden_pairs():
+    cost = np.array([[1.0, np.inf, 3.0],
+                     [np.inf, np.inf, np.inf],
+                     [2.0, 5.0, np.inf]])
+    rows, cols = min_cost_assignment(cost)
+    assert np.isfinite(cost[rows, cols]).all()
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 2), (2, 0)]
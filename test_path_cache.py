@@ -0,0 +1,18 @@
+from astar import astar
+from path_cache import PathCache
+
+ZONE = {'id': 1, 'polygon': [(40, 40), (70, 40), (70, 60), (40, 60)], 'time_window': (3, 30)}
+
+def test_failure_not_reused_after_zone_switches_off():
+    cache = PathCache()
+    assert cache.astar((10, 50), (55, 50), [ZONE], 1.0, start_time=0, speed=5) is None
+    fresh = astar((10, 50), (55, 50), [ZONE], 1.0, start_time=40, speed=5)
+    assert fresh is not None
+    assert cache.astar((10, 50), (55, 50), [ZONE], 1.0, start_time=40, speed=5) == fresh
+    assert cache.hits == 0 and cache.misses == 2
+
+def test_hit_while_zone_set_unchanged():
+    cache = PathCache()
+    path = cache.astar((10, 10), (30, 10), [ZONE], 1.0, start_time=0, speed=5)
+    assert cache.astar((10, 10), (30, 10), [ZONE], 1.0, start_time=1, speed=5) == path
+    assert cache.hits == 1
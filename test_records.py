@@ -0,0 +1,77 @@
+import copy
+
+import pytest
+
+from data import drones, deliveries
+from records import DeliveryStore, DroneStore
+from scenarios import generate_scenario
+from simulation import SimulationEngine
+from utils import get_available_deliveries, get_available_drones
+
+def test_views_read_like_dicts():
+    store = DeliveryStore(deliveries)
+    assert store.to_dicts() == [dict(d, assigned=False, drone_id=None) for d in deliveries]
+    view = store[3]
+    assert view['pos'] == deliveries[3]['pos'] and view.get('missing', 7) == 7
+    assert store[3] is view and list(store)[3] is view
+
+def test_view_round_trip_through_copy_append_reset():
+    fleet = DroneStore(drones)
+    drone = fleet[0]
+    assert drone['current_pos'] == drone['start_pos']
+    assert drone['battery_left'] == drone['battery']
+    drone['battery_left'] = 5.0
+    drone['assigned_delivery'] = deliveries[0]
+
+    clone = fleet.copy()
+    assert clone.to_dicts() == fleet.to_dicts()
+    clone[0]['battery_left'] = 99.0
+    assert drone['battery_left'] == 5.0
+
+    added = fleet.append(drone.copy())
+    assert added.copy() == drone.copy() and added is fleet[len(fleet) - 1]
+    for k in range(20):  # grows past the initial capacity
+        fleet.append(dict(drones[k % len(drones)], id=100 + k))
+    assert fleet[0].copy() == drone.copy() and fleet[-1]['id'] == 119
+    fresh = fleet.append({'id': 7, 'max_weight': 1, 'battery': 2, 'speed': 1, 'start_pos': (3, 4)})
+    assert fresh['current_pos'] == (3.0, 4.0) and fresh['battery_left'] == 2.0
+
+    fleet.reset()
+    assert drone['battery_left'] == drone['battery']
+    assert drone['assigned_delivery'] is None
+
+    store = DeliveryStore(deliveries)
+    store[2]['assigned'] = True
+    store[2]['drone_id'] = 4
+    assert store.copy()[2]['drone_id'] == 4
+    store.reset()
+    assert store[2]['assigned'] is False and store[2]['drone_id'] is None
+
+def test_mask_filters_match_list_filters():
+    fleet = DroneStore(drones)
+    fleet.reset()
+    fleet[1]['battery_left'] = 10
+    store = DeliveryStore(deliveries)
+    store[0]['assigned'] = True
+    for time in (0, 25, 60, 130):
+        as_dicts = store.to_dicts()
+        assert ([d['id'] for d in get_available_deliveries(store, time)]
+                == [d['id'] for d in get_available_deliveries(as_dicts, time)])
+    assert ([d['id'] for d in get_available_drones(fleet, 0)]
+            == [d['id'] for d in get_available_drones(fleet.to_dicts(), 0)])
+
+@pytest.mark.parametrize("policy", ["greedy", "nearest", "assignment"])
+def test_engine_runs_the_same_on_stores(policy):
+    scenario = generate_scenario(6, 40, 4, seed=7)
+    outcomes = []
+    for to_store in (False, True):
+        run_drones, run_deliveries, run_zones = copy.deepcopy(scenario)
+        if to_store:
+            run_drones, run_deliveries = DroneStore(run_drones), DeliveryStore(run_deliveries)
+        engine = SimulationEngine(run_drones, run_deliveries, run_zones, policy=policy)
+        engine.reset()
+        results = engine.run()
+        outcomes.append((results['completed'], results['failed'],
+                         pytest.approx(results['energy_used']),
+                         sorted(d['id'] for d in engine.completed_deliveries)))
+    assert outcomes[0] == outcomes[1]
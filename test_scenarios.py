@@ -0,0 +1,37 @@
+from shapely.geometry import Point, Polygon
+
+from astar import MAP_BOUNDS
+from data import drones as sample_drones, deliveries as sample_deliveries
+from scenarios import generate_scenario
+
+def test_same_seed_same_scenario():
+    assert generate_scenario(10, 50, 5, seed=3) == generate_scenario(10, 50, 5, seed=3)
+    assert generate_scenario(10, 50, 5, seed=3) != generate_scenario(10, 50, 5, seed=4)
+
+def test_scenario_schema():
+    drones, deliveries, zones = generate_scenario(10, 50, 5, seed=1)
+    assert len(drones) == 10 and len(deliveries) == 50 and len(zones) == 5
+    assert all(d.keys() == sample_drones[0].keys() for d in drones)
+    assert all(d.keys() == sample_deliveries[0].keys() for d in deliveries)
+    x0, y0, x1, y1 = MAP_BOUNDS
+    for delivery in deliveries:
+        x, y = delivery['pos']
+        assert x0 <= x <= x1 and y0 <= y <= y1
+        assert 0 <= delivery['time_window'][0] < delivery['time_window'][1]
+        assert 1 <= delivery['priority'] <= 5
+    for zone in zones:
+        assert Polygon(zone['polygon']).is_valid
+        assert zone['time_window'][0] < zone['time_window'][1]
+
+def test_zone_overlap():
+    for seed in range(5):
+        _, _, zones = generate_scenario(1, 1, 12, seed=seed, zone_overlap=1.0)
+        polygons = [Polygon(zone['polygon']) for zone in zones]
+        for i in range(1, len(polygons)):
+            assert any(polygons[i].intersects(polygons[j]) for j in range(i))
+
+def test_deliveries_avoid_static_zones():
+    _, deliveries, zones = generate_scenario(5, 200, 5, seed=2, static_zones=1.0)
+    polygons = [Polygon(zone['polygon']) for zone in zones]
+    inside = sum(any(p.contains(Point(d['pos'])) for p in polygons) for d in deliveries)
+    assert inside <= len(deliveries) * 0.05
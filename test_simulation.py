@@ -0,0 +1,23 @@
+import copy
+import math
+
+import numpy as np
+import pytest
+
+from astar import goal_tolerance
+from data import deliveries, drones
+from simulation import SimulationEngine
+from utils import energy_per_unit
+
+def test_screen_measures_from_current_position():
+    engine = SimulationEngine(copy.deepcopy(drones), copy.deepcopy(deliveries), [])
+    engine.reset()
+    engine.drones[0]['current_pos'] = (95.0, 95.0)
+    engine.start()
+    drone = engine.active_drones[0]
+    bounds = engine.screen([drone], engine.deliveries)[0]
+    expected = [max(math.dist(drone['current_pos'], d['pos']) - goal_tolerance(engine.planner), 0)
+                * energy_per_unit(drone, d['weight']) for d in engine.deliveries]
+    finite = np.isfinite(bounds)
+    assert finite.any()
+    assert bounds[finite] == pytest.approx(np.array(expected)[finite])
@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+import pytest
+
+from scenarios import generate_scenario
+from spatial_index import GridIndex
+
+def linear_nearest(points, pos, k, max_radius=math.inf, where=None):
+    found = sorted((math.dist(p, pos), i) for i, p in enumerate(points)
+                   if math.dist(p, pos) <= max_radius and (where is None or where(i)))
+    return [d for d, _ in found[:k]]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_nearest_matches_linear_scan(seed):
+    _, deliveries, _ = generate_scenario(1, 300, 0, seed=seed, clusters=4)
+    points = [d['pos'] for d in deliveries]
+    index = GridIndex(cell_size=7)
+    for i, point in enumerate(points):
+        index.insert(i, point)
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        pos = tuple(rng.uniform(-20, 120, 2))
+        k = int(rng.integers(1, 12))
+        found = [math.dist(points[i], pos) for i in index.nearest(pos, k)]
+        assert found == pytest.approx(linear_nearest(points, pos, k))
+        odd = lambda i: i % 2 == 1
+        found = [math.dist(points[i], pos) for i in index.nearest(pos, k, max_radius=15, where=odd)]
+        assert found == pytest.approx(linear_nearest(points, pos, k, 15, odd))
+        assert sorted(index.radius(pos, 10)) == sorted(
+            i for i, p in enumerate(points) if math.dist(p, pos) <= 10)
+
+def test_grid_moves_and_removals():
+    index = GridIndex()
+    index.insert('a', (0, 0))
+    index.insert('b', (50, 50))
+    index.move('a', (49, 49))
+    assert index.nearest((50, 50), 2) == ['b', 'a']
+    index.remove('b')
+    assert index.nearest((0, 0), 5) == ['a'] and len(index) == 1
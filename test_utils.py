@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point, Polygon
+
+from astar import astar, zone_index
+from scenarios import generate_scenario
+from utils import (batch_energy, calculate_energy, flatten_paths, points_in_polygons,
+                   segments_intersect_polygons)
+
+def test_padding_keeps_ray_casting_parity():
+    triangle = [(0, 0), (0, 10), (10, 5)]
+    square = [(20, 20), (30, 20), (30, 30), (20, 30)]
+    assert points_in_polygons([(2, 3)], [triangle]).tolist() == [[True]]
+    assert points_in_polygons([(2, 3)], [triangle, square]).tolist() == [[True, False]]
+
+def test_mixed_size_zones_match_shapely():
+    _, _, zones = generate_scenario(1, 1, 12, seed=4)
+    polygons = [zone['polygon'] for zone in zones]
+    polygons += [[(0, 0), (0, 10), (10, 5)], [(60, 60), (80, 60), (80, 70), (70, 80), (60, 70)]]
+    assert len({len(p) for p in polygons}) > 1
+    shapes = [Polygon(p) for p in polygons]
+    rng = np.random.default_rng(4)
+    points = rng.uniform(0, 100, (300, 2))
+    inside = points_in_polygons(points, polygons)
+    assert inside.tolist() == [[s.contains(Point(p)) for s in shapes] for p in points]
+    ends = rng.uniform(0, 100, (300, 2))
+    hits = segments_intersect_polygons(points, ends, polygons)
+    assert hits.tolist() == [[s.intersects(LineString([a, b])) for s in shapes]
+                             for a, b in zip(points, ends)]
+
+def test_batch_energy_matches_calculate_energy():
+    drones, deliveries, zones = generate_scenario(4, 30, 3, seed=5)
+    index = zone_index(zones)
+    legs = []
+    for i, delivery in enumerate(deliveries):
+        drone = drones[i % len(drones)]
+        path = astar(drone['start_pos'], delivery['pos'], index, delivery['weight'])
+        legs.append((path or [], drone, delivery['weight']))
+    # Empty and one-point paths cost nothing, wherever they sit in the batch
+    legs[:0] = [([], drones[0], 1.0), ([(5.0, 5.0)], drones[1], 2.0)]
+    legs.append(([(1.0, 1.0)], drones[2], 0.5))
+    paths, fleet, weights = zip(*legs)
+    energies = batch_energy(*flatten_paths(paths), [d['max_weight'] for d in fleet],
+                            [d['speed'] for d in fleet], weights)
+    assert energies == pytest.approx([calculate_energy(p, d, w) for p, d, w in legs])
+    assert energies[0] == energies[1] == energies[-1] == 0
@@ -1,101 +1,205 @@
 import math
 import heapq
+import numpy as np
 from shapely.geometry import LineString, Polygon
+from assignment import min_cost_assignment
+from astar import astar as plan_path
+from records import DeliveryStore, DroneStore
 
 def calculate_distance(p1, p2):
     """Calculate Euclidean distance between two points"""
     return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
 
+def path_length(path):
+    """Total Euclidean length of a path"""
+    return sum(calculate_distance(path[i], path[i+1]) for i in range(len(path) - 1))
+
 def assign_drones_to_deliveries(drones, deliveries):
-    assignments = {}
-    sorted_deliveries = sorted(deliveries, key=lambda d: d['priority'], reverse=True)
-    for delivery in sorted_deliveries:
-        for drone in drones:
-            if drone['max_weight'] >= delivery['weight']:
-                if drone['id'] not in assignments:
-                    assignments[drone['id']] = delivery
-                    break
-    return assignments
+    """Give each drone at most one delivery it can carry, as {drone id: delivery}.
+
+    Solved as one min-cost assignment: the total priority served comes
+    first, then the shortest total flight distance.
+    """
+    if not drones or not deliveries:
+        return {}
+    origins = np.array([d.get('current_pos', d['start_pos']) for d in drones], dtype=float)
+    targets = np.array([d['pos'] for d in deliveries], dtype=float)
+    distance = np.hypot(origins[:, None, 0] - targets[None, :, 0],
+                        origins[:, None, 1] - targets[None, :, 1])
+    priority = np.array([d['priority'] for d in deliveries], dtype=float)
+    capacity = np.array([d['max_weight'] for d in drones], dtype=float)
+    weight = np.array([d['weight'] for d in deliveries], dtype=float)
+    # One priority level outweighs any difference in distance
+    cost = distance - priority[None, :] * (distance.max() + 1)
+    cost[capacity[:, None] < weight[None, :]] = np.inf
+    rows, cols = min_cost_assignment(cost)
+    return {drones[i]['id']: deliveries[j] for i, j in zip(rows, cols)}
+
+def pad_polygons(polygons):
+    """Stack ragged polygons into an (Z, V, 2) array.
+
+    Shorter polygons are padded by repeating their last vertex; the
+    zero-length edges this creates never cross anything.
+    """
+    size = max((len(p) for p in polygons), default=1)
+    padded = np.zeros((len(polygons), size, 2))
+    for z, polygon in enumerate(polygons):
+        padded[z, :len(polygon)] = polygon
+        padded[z, len(polygon):] = polygon[-1]
+    return padded
+
+def polygon_edges(polygons):
+    """Start and end points of every polygon edge, each (Z, V, 2)"""
+    vertices = pad_polygons(polygons)
+    ends = np.empty_like(vertices)
+    ends[:, :-1] = vertices[:, 1:]
+    ends[:, -1] = vertices[:, -1]
+    # Closing edge goes from the last real vertex back to the first; the
+    # padding slots after it stay zero-length at the last vertex
+    for z, polygon in enumerate(polygons):
+        ends[z, len(polygon) - 1] = vertices[z, 0]
+    return vertices, ends
+
+def points_in_polygons(points, polygons):
+    """(N, Z) matrix: whether each point lies inside each polygon (ray casting)"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if not len(polygons):
+        return np.zeros((len(points), 0), dtype=bool)
+    e1, e2 = polygon_edges(polygons)
+    x = points[:, 0, None, None]
+    y = points[:, 1, None, None]
+    p1x, p1y = e1[None, ..., 0], e1[None, ..., 1]
+    p2x, p2y = e2[None, ..., 0], e2[None, ..., 1]
+    dy = p2y - p1y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xinters = np.where(dy != 0, (y - p1y) * (p2x - p1x) / dy + p1x, np.inf)
+    crossings = (
+        (y > np.minimum(p1y, p2y)) & (y <= np.maximum(p1y, p2y))
+        & (x <= np.maximum(p1x, p2x)) & ((p1x == p2x) | (x <= xinters))
+    )
+    return crossings.sum(axis=2) % 2 == 1
+
+def segments_intersect_polygons(p1s, p2s, polygons, include_inside=True):
+    """(N, Z) matrix: whether each segment p1s[i]-p2s[i] meets each polygon.
+
+    A segment meets a polygon when it crosses one of its edges or, with
+    `include_inside`, when it lies entirely inside it. Everything is done
+    with NumPy broadcasting over segments x polygons x edges.
+    """
+    p1s = np.asarray(p1s, dtype=float).reshape(-1, 2)
+    p2s = np.asarray(p2s, dtype=float).reshape(-1, 2)
+    if not len(polygons):
+        return np.zeros((len(p1s), 0), dtype=bool)
+    e1, e2 = polygon_edges(polygons)
+
+    def ccw(A, B, C):
+        return (C[..., 1]-A[..., 1]) * (B[..., 0]-A[..., 0]) > (B[..., 1]-A[..., 1]) * (C[..., 0]-A[..., 0])
+
+    A = p1s[:, None, None, :]
+    B = p2s[:, None, None, :]
+    C = e1[None]
+    D = e2[None]
+    crosses = ((ccw(A, C, D) != ccw(B, C, D)) & (ccw(A, B, C) != ccw(A, B, D))).any(axis=2)
+    if include_inside:
+        crosses |= points_in_polygons(p1s, polygons)
+    return crosses
 
 def point_in_polygon(point, polygon):
-    x, y = point
-    inside = False
-    n = len(polygon)
-    p1x, p1y = polygon[0]
-    for i in range(n+1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y)*(p2x - p1x)/(p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-    return inside
+    return bool(points_in_polygons([point], [polygon])[0, 0])
 
 def line_intersects_polygon(p1, p2, polygon):
-    def ccw(A, B, C):
-        return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
+    return bool(segments_intersect_polygons([p1], [p2], [polygon], include_inside=False)[0, 0])
 
-    def segments_intersect(A, B, C, D):
-        return ccw(A,C,D) != ccw(B,C,D) and ccw(A,B,C) != ccw(A,B,D)
+def active_zones(no_fly_zones, current_time):
+    """Boolean mask of the zones active at `current_time`"""
+    return np.array([z['time_window'][0] <= current_time <= z['time_window'][1]
+                     for z in no_fly_zones], dtype=bool)
 
-    n = len(polygon)
-    for i in range(n):
-        poly_p1 = polygon[i]
-        poly_p2 = polygon[(i+1) % n]
-        if segments_intersect(p1, p2, poly_p1, poly_p2):
-            return True
-    return False
+def segments_intersect_no_fly_zones(p1s, p2s, no_fly_zones, current_time=None,
+                                    include_inside=True):
+    """(N, Z) matrix of segment/zone hits, ignoring zones inactive at `current_time`"""
+    hits = segments_intersect_polygons(p1s, p2s, [z['polygon'] for z in no_fly_zones],
+                                       include_inside=include_inside)
+    if current_time is not None:
+        hits &= active_zones(no_fly_zones, current_time)[None, :]
+    return hits
 
 def intersects_no_fly_zone(p1, p2, no_fly_zones, current_time):
-    for zone in no_fly_zones:
-        start_time, end_time = zone['active_time']
-        if not (start_time <= current_time <= end_time):
-            continue
-        polygon = zone['coordinates']
-        if line_intersects_polygon(p1, p2, polygon):
-            return True
-    return False
-
-def astar(start, goal, no_fly_zones, current_time=0):
-    if intersects_no_fly_zone(start, goal, no_fly_zones, current_time):
-        return None
-    return [start, goal]
+    hits = segments_intersect_no_fly_zones([p1], [p2], no_fly_zones, current_time,
+                                           include_inside=False)
+    return bool(hits.any())
 
-def calculate_energy(path, drone, package_weight=0):
-    """Calculate energy consumption for a path"""
-    if not path or len(path) < 2:
-        return 0
-    
-    # Base energy consumption per unit distance
-    base_energy = 10
-    
+def astar(start, goal, no_fly_zones, current_time=0, speed=None, weight=0):
+    """Plan a path with the time-aware planner in astar.py"""
+    return plan_path(start, goal, no_fly_zones, weight,
+                     start_time=current_time, speed=speed)
+
+# Base energy consumption per unit distance
+BASE_ENERGY = 10
+
+def energy_per_unit(drone, package_weight=0):
+    """Energy a drone spends per unit distance carrying `package_weight`"""
     # Energy multiplier based on package weight
     weight_factor = 1 + (package_weight / drone['max_weight'])
     
     # Speed factor (faster drones consume more energy)
     speed_factor = 1 + (drone['speed'] / 10)
     
-    total_energy = 0
-    for i in range(len(path)-1):
-        distance = calculate_distance(path[i], path[i+1])
-        # Energy consumption increases with distance, weight, and speed
-        segment_energy = distance * base_energy * weight_factor * speed_factor
-        total_energy += segment_energy
-    
-    return total_energy
+    return BASE_ENERGY * weight_factor * speed_factor
+
+def flatten_paths(paths):
+    """Ragged paths as one (P, 2) point array plus (n + 1,) offsets.
+
+    Path i is `points[offsets[i]:offsets[i + 1]]`.
+    """
+    offsets = np.zeros(len(paths) + 1, dtype=int)
+    np.cumsum([len(path) for path in paths], out=offsets[1:])
+    points = np.array([point for path in paths for point in path], dtype=float).reshape(-1, 2)
+    return points, offsets
+
+def path_lengths(points, offsets):
+    """Length of every path in a flat (points, offsets) batch"""
+    offsets = np.asarray(offsets, dtype=int)
+    counts = np.diff(offsets)
+    if not len(points):
+        return np.zeros(len(counts))
+    # Segment i runs from point i to i + 1; those joining two paths are dropped
+    segments = np.zeros(len(points))
+    segments[:-1] = np.hypot(*np.diff(points, axis=0).T)
+    segments[offsets[1:-1] - 1] = 0
+    lengths = np.add.reduceat(segments, np.minimum(offsets[:-1], len(points) - 1))
+    lengths[counts < 2] = 0
+    return lengths
+
+def batch_energy(points, offsets, max_weight, speed, package_weight=0):
+    """`calculate_energy` for every path of a flat (points, offsets) batch.
+
+    `max_weight`, `speed` and `package_weight` are per-path arrays or
+    scalars. Returns one energy per path, computed in a single pass.
+    """
+    rate = (BASE_ENERGY * (1 + np.asarray(package_weight, dtype=float) / np.asarray(max_weight, dtype=float))
+            * (1 + np.asarray(speed, dtype=float) / 10))
+    return path_lengths(points, offsets) * rate
+
+def calculate_energy(path, drone, package_weight=0):
+    """Calculate energy consumption for a path"""
+    if not path or len(path) < 2:
+        return 0
+    # One path of `batch_energy`, kept in plain Python: cheaper than NumPy for a single short path
+    return path_length(path) * energy_per_unit(drone, package_weight)
 
 def check_time_window(current_time, delivery):
     """Check if a delivery is within its time window"""
     start, end = delivery['time_window']
     return start <= current_time <= end
 
+# Minimum battery to take on a new delivery
+MIN_BATTERY = 1000
+
 def is_drone_available(drone, current_time, current_delivery=None):
     """Check if a drone is available for a new delivery"""
     # Check battery level
-    if drone['battery_left'] < 1000:  # Minimum battery threshold
+    if drone['battery_left'] < MIN_BATTERY:
         return False
     
     # If drone is currently assigned, check if it can take another delivery
@@ -106,10 +210,16 @@ def is_drone_available(drone, current_time, current_delivery=None):
 
 def get_available_drones(drones, current_time):
     """Get list of drones available for new deliveries"""
+    if isinstance(drones, DroneStore):
+        return drones.select(drones.column('battery_left') >= MIN_BATTERY)
     return [drone for drone in drones if is_drone_available(drone, current_time)]
 
 def get_available_deliveries(deliveries, current_time):
     """Get list of deliveries available at current time"""
+    if isinstance(deliveries, DeliveryStore):
+        window = deliveries.column('time_window')
+        return deliveries.select((window[:, 0] <= current_time) & (current_time <= window[:, 1])
+                                 & ~deliveries.column('assigned'))
     return [d for d in deliveries if check_time_window(current_time, d) and not d['assigned']]
 
 def calculate_delivery_score(delivery, current_time):